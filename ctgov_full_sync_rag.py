@@ -1,6 +1,7 @@
 import os
-import json
+import re
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
 from pathlib import Path
@@ -10,8 +11,17 @@ load_dotenv()
 
 # LLM 配置已抽取到 lib/llm_client.py(消除多文件重复)
 # 全文翻译使用 PROMPT_FULL_MARKDOWN(保留原有 Markdown 结构)
-from lib.llm_client import translate_text as _translate_base, PROMPT_FULL_MARKDOWN
+from lib.llm_client import translate_text as _translate_base, translate_batch, translate_many, PROMPT_FULL_MARKDOWN
 from lib.branding import get_footer, is_pancreatic
+from lib.ctgov_api import dget
+from lib.json_io import load_json, dump_json_compact
+from lib.study_data import ack_pending, mark_pending, read_pending
+
+# Markdown 按二级标题切分(零宽前瞻,标题行保留在各自分段开头)
+_SECTION_SPLIT_RE = re.compile(r"(?=^## )", re.M)
+
+# 标题清洗:非 字母数字/下划线/空格/-/, 的字符替换为 _(预编译,单次 C 层替换)
+_UNSAFE_TITLE_RE = re.compile(r"[^\w \-,]")
 
 def translate_text(text):
     """
@@ -20,59 +30,76 @@ def translate_text(text):
     """
     return _translate_base(text, system_prompt=PROMPT_FULL_MARKDOWN, retry=1, timeout=120)
 
+def translate_markdown(md):
+    """
+    按 "## " 二级标题分段并发翻译后按原顺序拼回。
+    每段都远小于单次请求的 token 上限,避免长文被截断;
+    总耗时约为最慢一段而非各段之和(并发受 llm_client 限流器约束)。
+    """
+    sections = [s.strip() for s in _SECTION_SPLIT_RE.split(md) if s.strip()]
+    translated = translate_many(sections, system_prompt=PROMPT_FULL_MARKDOWN, max_workers=4, timeout=120)
+    return "\n\n".join(translated.get(s, s).strip() for s in sections)
+
 def format_to_markdown_en(study):
     protocol = study.get("protocolSection", {})
-    ident = protocol.get("identificationModule", {})
-    status = protocol.get("statusModule", {})
-    desc = protocol.get("descriptionModule", {})
-    cond = protocol.get("conditionsModule", {})
-    design = protocol.get("designModule", {})
+    ident_get = protocol.get("identificationModule", {}).get
+    status_get = protocol.get("statusModule", {}).get
+    desc_get = protocol.get("descriptionModule", {}).get
+    cond_get = protocol.get("conditionsModule", {}).get
+    design_get = protocol.get("designModule", {}).get
     arms = protocol.get("armsInterventionsModule", {})
     sponsor = protocol.get("sponsorCollaboratorsModule", {})
-    eligibility = protocol.get("eligibilityModule", {})
+    elig_get = protocol.get("eligibilityModule", {}).get
     outcomes = protocol.get("outcomesModule", {})
     loc_mod = protocol.get("contactsLocationsModule", {})
-    
-    nct_id = ident.get("nctId", "N/A")
+
+    nct_id = ident_get("nctId", "N/A")
 
     # 提取发起方和协作方
-    lead_sponsor = sponsor.get("leadSponsor", {}).get("name", "N/A")
+    lead_sponsor = dget(sponsor, "leadSponsor", "name")
     collaborators = [c.get("name") for c in sponsor.get("collaborators", [])]
     collaborators_str = ", ".join(collaborators) if collaborators else "None"
 
     # 提取中心信息 (区分中国和其他)
-    locations = loc_mod.get("locations", [])
     china_locations = []
     other_locations = []
-    for loc in locations:
-        loc_str = f"- {loc.get('facility', 'N/A')} ({loc.get('city', 'N/A')}, {loc.get('country', 'N/A')}) - Status: {loc.get('status', 'N/A')}"
-        if loc.get('country') == "China":
+    for loc in loc_mod.get("locations", []):
+        loc_get = loc.get
+        country = loc_get('country', 'N/A')
+        loc_str = f"- {loc_get('facility', 'N/A')} ({loc_get('city', 'N/A')}, {country}) - Status: {loc_get('status', 'N/A')}"
+        if country == "China":
             china_locations.append(loc_str)
         else:
             other_locations.append(loc_str)
 
-    lines = [
-        f"# 🏥 Clinical Trial Details: {nct_id}\n",
-        f"## Metadata",
-        f"- **NCT ID**: {nct_id}",
-        f"- **Overall Status**: {status.get('overallStatus', 'N/A')}",
-        f"- **Brief Title**: {ident.get('briefTitle', 'N/A')}",
-        f"- **Official Title**: {ident.get('officialTitle', 'N/A')}",
-        f"\n## 🏢 Organizations & Sponsors",
-        f"- **Lead Sponsor**: {lead_sponsor}",
-        f"- **Collaborators**: {collaborators_str}",
-        f"\n## 📝 Basic Information",
-        f"- **Study Type**: {design.get('studyType', 'N/A')}",
-        f"- **Phase**: {', '.join(design.get('phases', [])) if design.get('phases') else 'N/A'}",
-        f"- **Enrollment**: {design.get('enrollmentInfo', {}).get('count', 'N/A')} ({design.get('enrollmentInfo', {}).get('type', 'N/A')})",
-        f"\n## 🧪 Study Design & Details",
-        f"- **Conditions**: {', '.join(cond.get('conditions', [])) if cond.get('conditions') else 'N/A'}"
-    ]
-    
+    phases = design_get('phases')
+    conditions = cond_get('conditions')
+
+    # 连续的静态段落合并为一个多行块,最终以 "\n" 拼接
+    lines = [f"""# 🏥 Clinical Trial Details: {nct_id}
+
+## Metadata
+- **NCT ID**: {nct_id}
+- **Overall Status**: {status_get('overallStatus', 'N/A')}
+- **Brief Title**: {ident_get('briefTitle', 'N/A')}
+- **Official Title**: {ident_get('officialTitle', 'N/A')}
+
+## 🏢 Organizations & Sponsors
+- **Lead Sponsor**: {lead_sponsor}
+- **Collaborators**: {collaborators_str}
+
+## 📝 Basic Information
+- **Study Type**: {design_get('studyType', 'N/A')}
+- **Phase**: {', '.join(phases) if phases else 'N/A'}
+- **Enrollment**: {dget(protocol, 'designModule', 'enrollmentInfo', 'count')} ({dget(protocol, 'designModule', 'enrollmentInfo', 'type')})
+
+## 🧪 Study Design & Details
+- **Conditions**: {', '.join(conditions) if conditions else 'N/A'}"""]
+
     # 干预措施
     interventions = arms.get("interventions", [])
     if interventions:
-        lines.append(f"\n### Interventions")
+        lines.append("\n### Interventions")
         for inv in interventions:
             lines.append(f"- **{inv.get('type', 'Unknown')}**: {inv.get('name', 'N/A')}")
             if inv.get('description'):
@@ -81,127 +108,192 @@ def format_to_markdown_en(study):
     # 主要和次要终点
     primary = outcomes.get("primaryOutcomes", [])
     if primary:
-        lines.append(f"\n## 📊 Primary Outcomes")
-        for o in primary:
-            lines.append(f"- **{o.get('measure', 'N/A')}**: {o.get('description', 'N/A')}")
-            
+        lines.append("\n## 📊 Primary Outcomes")
+        lines.extend(f"- **{o.get('measure', 'N/A')}**: {o.get('description', 'N/A')}" for o in primary)
+
     # 描述部分
-    lines.append(f"\n## 📖 Summary & Description")
-    lines.append(f"### Brief Summary\n{desc.get('briefSummary', 'No summary available.')}")
-    if desc.get('detailedDescription'):
-        lines.append(f"\n### Detailed Description\n{desc.get('detailedDescription')}")
+    lines.append(f"\n## 📖 Summary & Description\n### Brief Summary\n{desc_get('briefSummary', 'No summary available.')}")
+    if desc_get('detailedDescription'):
+        lines.append(f"\n### Detailed Description\n{desc_get('detailedDescription')}")
 
     # 入组标准
-    lines.append(f"\n## 📋 Eligibility Criteria")
-    lines.append(f"- **Gender**: {eligibility.get('sex', 'N/A')}")
-    lines.append(f"- **Minimum Age**: {eligibility.get('minimumAge', 'N/A')}")
-    lines.append(f"- **Maximum Age**: {eligibility.get('maximumAge', 'N/A')}")
-    if eligibility.get('eligibilityCriteria'):
-        lines.append(f"\n### Detailed Criteria\n{eligibility.get('eligibilityCriteria')}")
+    lines.append(f"""
+## 📋 Eligibility Criteria
+- **Gender**: {elig_get('sex', 'N/A')}
+- **Minimum Age**: {elig_get('minimumAge', 'N/A')}
+- **Maximum Age**: {elig_get('maximumAge', 'N/A')}""")
+    if elig_get('eligibilityCriteria'):
+        lines.append(f"\n### Detailed Criteria\n{elig_get('eligibilityCriteria')}")
 
     # 临床中心信息
-    lines.append(f"\n## 📍 Study Locations")
-    lines.append(f"### 🇨🇳 China Centers")
-    lines.append("\n".join(china_locations) if china_locations else "No centers listed in China.")
-    lines.append(f"\n### Global Centers")
-    lines.append("\n".join(other_locations[:20]) if other_locations else "No other centers listed.")
+    china_block = "\n".join(china_locations) if china_locations else "No centers listed in China."
+    other_block = "\n".join(other_locations[:20]) if other_locations else "No other centers listed."
+    lines.append(f"\n## 📍 Study Locations\n### 🇨🇳 China Centers\n{china_block}\n\n### Global Centers\n{other_block}")
     if len(other_locations) > 20:
         lines.append(f"...(and {len(other_locations)-20} more)")
-        
-    lines.append(f"\n## 📑 Links")
-    lines.append(f"- [View on ClinicalTrials.gov](https://clinicaltrials.gov/study/{nct_id})")
-    
+
+    lines.append(f"\n## 📑 Links\n- [View on ClinicalTrials.gov](https://clinicaltrials.gov/study/{nct_id})")
+
     return "\n".join(lines)
 
-def translate_json_recursively(data):
+# 需要翻译的核心长文本字段
+_TRANSLATE_KEYS = {"briefSummary", "detailedDescription", "eligibilityCriteria", "officialTitle", "briefTitle", "measure", "description"}
+
+def _collect_translate_targets(data, targets):
     """
-    递归翻译 JSON 中的关键文本字段，保持结构不变
+    第 1 遍:递归收集待翻译字段,追加 (父容器, key, 原文) 到 targets。
+    保存父容器引用而非字符串路径,回填时无需再次遍历。
     """
     if isinstance(data, dict):
-        for key in list(data.keys()):
-            value = data[key]
-            # 翻译核心长文本字段
-            if key in ["briefSummary", "detailedDescription", "eligibilityCriteria", "officialTitle", "briefTitle", "measure", "description"]:
+        for key, value in data.items():
+            if key in _TRANSLATE_KEYS:
                 if isinstance(value, str) and len(value) > 10:
-                    data[key] = translate_text(value)
+                    targets.append((data, key, value))
             else:
-                translate_json_recursively(value)
+                _collect_translate_targets(value, targets)
     elif isinstance(data, list):
         for item in data:
-            translate_json_recursively(item)
+            _collect_translate_targets(item, targets)
+
+def translate_json_recursively(data):
+    """
+    翻译 JSON 中的关键文本字段，保持结构不变。
+    所有字段合并为一次批量请求(JSON 进 JSON 出),批量结果无法解析时回退逐字段翻译。
+    """
+    targets = []
+    _collect_translate_targets(data, targets)
+    if not targets:
+        return
+
+    translated = translate_batch({str(i): text for i, (_, _, text) in enumerate(targets)})
+    if translated is None:
+        print(f"[{datetime.now()}] Batch translation unavailable, falling back to per-field ({len(targets)} fields)")
+        translated = {}
+
+    # 第 2 遍:按保存的父容器引用回填;批量结果缺失的字段单独翻译
+    for i, (parent, key, text) in enumerate(targets):
+        result = translated.get(str(i))
+        parent[key] = result if result is not None else translate_text(text)
+
+# 并发处理的文件数(网络 I/O 密集,用线程;限流器/翻译缓存在线程间共享)
+SYNC_WORKERS = int(os.getenv("SYNC_WORKERS", "4"))
+
+# 无索引时的回退扫描只看最近 N 天修改过的 JSON
+BACKFILL_DAYS = 7
+
+def _sync_one(json_file):
+    """
+    处理单个 pending JSON:生成英文 Markdown、翻译、落地 en/cn 文档并回写状态。
+    返回 False 表示处理失败(需保留在待同步索引中)。
+    """
+    folder = json_file.parent
+    try:
+        data = load_json(json_file)
+
+        if data.get("sync_status") != "pending":
+            return True
+
+        print(f"[{datetime.now()}] Deep syncing (Full Translation) {json_file.name}...")
+        study = data["original"]
+
+        # 直接生成完整的英文 Markdown (包含多中心和发起方)
+        md_en = format_to_markdown_en(study)
+
+        # 对 JSON 内容进行中文递归翻译 (保持结构)
+        translate_json_recursively(data)
+
+        # 全文 Markdown 按章节分段并发精翻
+        md_cn = translate_markdown(md_en)
+
+        # 追加社区公益脚注(胰腺癌专属 / 其它疾病通用,按目录名对应的疾病判断)
+        # folder.name 形如 "2026-06-21-Breast_Cancer",提取日期后的疾病名
+        folder_disease = "-".join(folder.name.split("-")[3:]).replace("_", " ")
+        footer_text = get_footer(folder_disease).lstrip("* ").strip()
+        footer = f"\n\n---\n**{footer_text}**"
+        md_cn += footer
+
+        # 生成描述性文件名 (Date-NCT-Title)
+        nct_id = dget(study, "protocolSection", "identificationModule", "nctId", default=json_file.stem)
+        brief_title = dget(study, "protocolSection", "identificationModule", "briefTitle", default="")
+        # 清理标题中的特殊字符，保留空格和基本标点
+        clean_title = _UNSAFE_TITLE_RE.sub("_", brief_title)[:60].strip()
+        date_str = datetime.now().strftime("%Y-%m-%d")
+        base_name = f"{date_str}-{nct_id}-{clean_title}".strip("-")
+
+        # 落地存储
+        en_dir = folder / "en"
+        cn_dir = folder / "cn"
+        en_dir.mkdir(exist_ok=True)
+        cn_dir.mkdir(exist_ok=True)
+
+        with open(en_dir / f"{base_name}.md", "w", encoding="utf-8") as f:
+            f.write(md_en)
+        # 配合同步逻辑，中文精翻文档统一加上 -zh 后缀
+        with open(cn_dir / f"{base_name}-zh.md", "w", encoding="utf-8") as f:
+            f.write(md_cn)
+
+        # 更新 JSON 状态
+        data["sync_status"] = "synced"
+        # 清除旧的片段翻译缓存
+        if "full_translated" in data:
+            del data["full_translated"]
+
+        # 回写只供脚本读取:紧凑格式,大文件自动 gzip 为 .json.gz
+        dump_json_compact(data, json_file)
+
+        print(f"[{datetime.now()}] Successfully full-synced {json_file.name}")
+        return True
+
+    except Exception as e:
+        print(f"Error processing {json_file}: {e}")
+        return False
+
+def _scan_recent_json(output_path, days=BACKFILL_DAYS):
+    """回退扫描:os.scandir 遍历 output/*/*.json(含 .json.gz),跳过 mtime 早于 days 天前的文件"""
+    cutoff = datetime.now().timestamp() - days * 86400
+    found = []
+    with os.scandir(output_path) as folders:
+        for folder in folders:
+            if not folder.is_dir() or folder.name.startswith("."):
+                continue
+            with os.scandir(folder.path) as entries:
+                for entry in entries:
+                    if (entry.name.endswith((".json", ".json.gz")) and entry.is_file()
+                            and entry.stat().st_mtime >= cutoff):
+                        found.append(Path(entry.path))
+    return found
 
 def process_pending_sync():
     output_path = Path("output")
     if not output_path.exists():
         return
 
-    for folder in output_path.iterdir():
-        if not folder.is_dir():
-            continue
-            
-        for json_file in folder.glob("*.json"):
-            try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                if data.get("sync_status") != "pending":
-                    continue
-                
-                print(f"[{datetime.now()}] Deep syncing (Full Translation) {json_file.name}...")
-                study = data["original"]
-                
-                # 直接生成完整的英文 Markdown (包含多中心和发起方)
-                md_en = format_to_markdown_en(study)
-                
-                # 对 JSON 内容进行中文递归翻译 (保持结构)
-                translate_json_recursively(data)
-                
-                # 直接对全文 Markdown 进行精翻
-                md_cn = translate_text(md_en)
-                
-                # 追加社区公益脚注(胰腺癌专属 / 其它疾病通用,按目录名对应的疾病判断)
-                # folder.name 形如 "2026-06-21-Breast_Cancer",提取日期后的疾病名
-                folder_disease = "-".join(folder.name.split("-")[3:]).replace("_", " ")
-                footer_text = get_footer(folder_disease).lstrip("* ").strip()
-                footer = f"\n\n---\n**{footer_text}**"
-                md_cn += footer
-
-                # 生成描述性文件名 (Date-NCT-Title)
-                ident = study.get("protocolSection", {}).get("identificationModule", {})
-                nct_id = ident.get("nctId", json_file.stem)
-                brief_title = ident.get("briefTitle", "")
-                # 清理标题中的特殊字符，保留空格和基本标点
-                clean_title = "".join([c if c.isalnum() or c in " -_," else "_" for c in brief_title])[:60].strip()
-                date_str = datetime.now().strftime("%Y-%m-%d")
-                base_name = f"{date_str}-{nct_id}-{clean_title}".strip("-")
-                
-                # 落地存储
-                en_dir = folder / "en"
-                cn_dir = folder / "cn"
-                en_dir.mkdir(exist_ok=True)
-                cn_dir.mkdir(exist_ok=True)
-                
-                with open(en_dir / f"{base_name}.md", "w", encoding="utf-8") as f:
-                    f.write(md_en)
-                # 配合同步逻辑，中文精翻文档统一加上 -zh 后缀
-                with open(cn_dir / f"{base_name}-zh.md", "w", encoding="utf-8") as f:
-                    f.write(md_cn)
-                
-                # 更新 JSON 状态
-                data["sync_status"] = "synced"
-                # 清除旧的片段翻译缓存
-                if "full_translated" in data:
-                    del data["full_translated"]
-                    
-                with open(json_file, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-                
-                print(f"[{datetime.now()}] Successfully full-synced {json_file.name}")
-                
-            except Exception as e:
-                print(f"Error processing {json_file}: {e}")
+    # 优先读取 save_study_json 维护的待同步索引,索引不存在时回退为近期文件扫描
+    pending = read_pending()
+    if pending is None:
+        json_files = _scan_recent_json(output_path)
+    else:
+        # 已不存在的文件直接从索引移除
+        ack_pending(*(p for p in pending if not os.path.exists(p)))
+        json_files = [Path(p) for p in pending if os.path.exists(p)]
+    if not json_files:
+        return
 
-if __name__ == "__main__":
+    # 各文件相互独立,线程池并发处理(每个文件内部阻塞在多次 LLM 调用上)
+    with ThreadPoolExecutor(max_workers=max(1, SYNC_WORKERS)) as ex:
+        results = list(ex.map(_sync_one, json_files))
+
+    if pending is None:
+        # 目录扫描模式:失败的文件写入索引,下次运行重试
+        mark_pending(*(str(f) for f, ok in zip(json_files, results) if not ok))
+    else:
+        # 索引模式:只移除成功的条目,失败的留在索引中(中途崩溃时条目也不会丢失)
+        ack_pending(*(str(f) for f, ok in zip(json_files, results) if ok))
+
+def main():
     print(f"=== Full-text RAG Sync Task Started at {datetime.now()} ===")
     process_pending_sync()
     print(f"=== Sync Task Completed at {datetime.now()} ===")
+
+if __name__ == "__main__":
+    main()
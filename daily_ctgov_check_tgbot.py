@@ -3,7 +3,7 @@ daily_ctgov_check_tgbot.py - ClinicalTrials.gov 抓取 + 多渠道推送
 
 本文件已重构为薄调用方,核心能力已抽取到 lib/ 公共模块:
 - 抓取:lib.ctgov_api.fetch_studies
-- 翻译:lib.llm_client.translate_text
+- 翻译:lib.llm_client.translate_many + lib.content_builder.lookup_translation
 - 落地:lib.study_data.save_study_json
 - TG 推送:lib.channels.telegram
 - 微信推送:lib.channels.gewe
@@ -12,7 +12,6 @@ daily_ctgov_check_tgbot.py - ClinicalTrials.gov 抓取 + 多渠道推送
 确保向后兼容:`python3 daily_ctgov_check_tgbot.py` 行为与重构前一致。
 
 为兼容外部引用,保留以下别名:
-- translate_to_chinese → lib.llm_client.translate_text
 - fetch_clinical_trials → lib.ctgov_api.fetch_studies(带默认参数)
 - send_telegram_msg → lib.channels.telegram.send_msg
 - send_gewe_text / send_gewe_card → lib.channels.gewe
@@ -24,12 +23,13 @@ from datetime import datetime
 from dotenv import load_dotenv
 
 # ============ 导入公共模块 ============
-from lib.ctgov_api import fetch_studies, has_china_center, get_nct_id
-from lib.llm_client import translate_text as translate_to_chinese
+from lib.ctgov_api import fetch_studies, has_china_center, get_nct_id, dget
+from lib.llm_client import translate_many
 from lib.study_data import sanitize_filename, save_study_json
 from lib.channels.telegram import send_msg as send_telegram_msg
 from lib.channels.gewe import send_text as send_gewe_text, send_card as send_gewe_card
 from lib.branding import get_title, get_footer, disease_cn_name
+from lib.content_builder import translation_texts, lookup_translation
 
 load_dotenv()
 
@@ -45,29 +45,25 @@ def fetch_clinical_trials():
     return fetch_studies(days_back=30)
 
 
-def format_study_detail(study):
+def format_study_detail(study, translations=None):
     """
     格式化单个试验的详情文本,并落地 JSON。
     保留原有行为:翻译 + 组装详情 + save_study_json。
+    translations 为预先并发翻译好的 {原文: 译文} 缓存,命中时不再请求 LLM。
     """
-    protocol = study.get("protocolSection", {})
-    identification = protocol.get("identificationModule", {})
-    status_module = protocol.get("statusModule", {})
-    design_module = protocol.get("designModule", {})
-    conditions_module = protocol.get("conditionsModule", {})
-    contacts_locations = protocol.get("contactsLocationsModule", {})
-
-    nct_id = identification.get("nctId", "N/A")
-    brief_title = identification.get("briefTitle", "N/A")
-    official_title = identification.get("officialTitle", "N/A")
-    overall_status = status_module.get("overallStatus", "招募中")
-    phases = design_module.get("phases", ["N/A"])
-    conditions = conditions_module.get("conditions", ["N/A"])
+    protocol = study.get("protocolSection")
+
+    nct_id = dget(protocol, "identificationModule", "nctId")
+    brief_title = dget(protocol, "identificationModule", "briefTitle")
+    official_title = dget(protocol, "identificationModule", "officialTitle")
+    overall_status = dget(protocol, "statusModule", "overallStatus", default="招募中")
+    phases = dget(protocol, "designModule", "phases", default=["N/A"])
+    conditions = dget(protocol, "conditionsModule", "conditions", default=["N/A"])
 
     has_china = has_china_center(study)
     china_tag = "[🇨🇳 中国有中心] " if has_china else ""
 
-    central_contacts = contacts_locations.get("centralContacts", [])
+    central_contacts = dget(protocol, "contactsLocationsModule", "centralContacts", default=[])
     contact_info = "无"
     if central_contacts:
         c = central_contacts[0]
@@ -76,9 +72,9 @@ def format_study_detail(study):
                         f"电话: {c.get('phone', '无')}\n"
                         f"邮箱: {c.get('email', '无')}")
 
-    translated_title = translate_to_chinese(f"{brief_title} ({official_title})")
+    translated_title = lookup_translation(f"{brief_title} ({official_title})", translations)
     translated_status = "招募中" if overall_status == "RECRUITING" else overall_status
-    translated_conditions = translate_to_chinese(", ".join(conditions))
+    translated_conditions = lookup_translation(", ".join(conditions), translations)
 
     # 落地存储(用修复后的 save_study_json,extra_fields 真正写入)
     translated_info = {
@@ -124,6 +120,10 @@ def send_telegram_combined(studies):
     os.makedirs(base_dir, exist_ok=True)
     report_file = os.path.join(base_dir, "telegram_push_report.txt")
 
+    # 一次性并发翻译所有试验的标题/适应症,后续汇总和详情直接查缓存
+    print(f"[{datetime.now()}] Translating {len(studies)} studies concurrently...")
+    translations = translate_many(text for study in studies for text in translation_texts(study))
+
     with open(report_file, "w", encoding="utf-8") as rf:
         rf.write(f"# {get_title()} ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})\n\n")
         rf.write(f"## 🔬 {disease_cn_name(SEARCH_CONDITION)}临床试验每日更新\n\n")
@@ -138,11 +138,10 @@ def send_telegram_combined(studies):
         summary_msg = f"# {get_title()}\n\n发现 {len(studies)} 个符合条件的临床试验\n\n## 【汇总清单】\n"
         for i, study in enumerate(studies):
             nct_id = get_nct_id(study)
-            brief_title = study.get("protocolSection", {}).get("identificationModule", {}).get("briefTitle", "N/A")
+            brief_title = dget(study, "protocolSection", "identificationModule", "briefTitle")
             china_marker = "🇨🇳 " if has_china_center(study) else ""
 
-            print(f"[{datetime.now()}] Translating summary {i+1}/{len(studies)}: {nct_id}")
-            translated_brief = translate_to_chinese(brief_title)
+            translated_brief = lookup_translation(brief_title, translations)
 
             line = f"- {china_marker}标题：{translated_brief}\n  ❤️ 编号: {nct_id}\n  🔗 链接: https://clinicaltrials.gov/study/{nct_id}\n\n"
             summary_msg += line
@@ -176,7 +175,7 @@ def send_telegram_combined(studies):
                 nct_id = get_nct_id(study)
                 print(f"[{datetime.now()}] Processing details {current_idx}/{len(studies)}: {nct_id}")
                 group_details += f"### --- 临床基本信息 ({current_idx}/{len(studies)}) ---\n"
-                group_details += format_study_detail(study) + "\n"
+                group_details += format_study_detail(study, translations) + "\n"
 
             full_detail_group = detail_header + group_details
             send_telegram_msg(full_detail_group)
@@ -198,9 +197,13 @@ def send_telegram_combined(studies):
     print(f"[{datetime.now()}] Push report saved to: {report_file}")
 
 
-if __name__ == "__main__":
+def main():
     print(f"Starting task at {datetime.now()}")
     studies = fetch_clinical_trials()
     print(f"Found {len(studies)} studies.")
     send_telegram_combined(studies)
     print("Task completed.")
+
+
+if __name__ == "__main__":
+    main()
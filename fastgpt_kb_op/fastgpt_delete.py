@@ -1,7 +1,9 @@
 import os
+import re
 import json
 import requests
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -13,11 +15,16 @@ FASTGPT_BASE_URL = os.getenv("FASTGPT_BASE_URL", "").strip().rstrip("/")
 FASTGPT_API_KEY = os.getenv("FASTGPT_API_KEY", "").strip()
 FASTGPT_DATASET_ID = os.getenv("FASTGPT_DATASET_ID", "").strip()
 
+# 本地 name→id 索引(按 datasetId 分区);删除默认以接口查询为准,--use-index 时才按精确名称直接取用
+INDEX_FILE = Path("./.fastgpt_index.json")
+
+# 提取 URL 根(协议+域名),导入时编译一次
+_URL_ROOT_RE = re.compile(r'(https?://[^/]+)')
+
 class FastGPTManager:
     def __init__(self):
         # 兼容标准 API 路径
-        import re
-        match = re.match(r'(https?://[^/]+)', FASTGPT_BASE_URL)
+        match = _URL_ROOT_RE.match(FASTGPT_BASE_URL)
         root = match.group(1) if match else FASTGPT_BASE_URL.rstrip('/')
         self.api_base = f"{root}/api"
         
@@ -28,11 +35,45 @@ class FastGPTManager:
             "datasetId": FASTGPT_DATASET_ID,
             "Content-Type": "application/json"
         }
+        # 复用同一个 Session(keep-alive + 连接池),避免每次请求重新握手
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self._index = self._load_index()
+
+    def _load_index(self):
+        """读取本地索引,返回当前数据集的 {name: [集合信息]};不存在或损坏时返回空表"""
+        if INDEX_FILE.exists():
+            try:
+                with open(INDEX_FILE, "r", encoding="utf-8") as f:
+                    return json.load(f).get(FASTGPT_DATASET_ID, {}).get("collections", {})
+            except Exception as e:
+                print(f"⚠️  Failed to load index {INDEX_FILE}: {e}")
+        return {}
+
+    def _save_index(self):
+        """写回本地索引(保留其它数据集的分区)"""
+        try:
+            all_index = {}
+            if INDEX_FILE.exists():
+                with open(INDEX_FILE, "r", encoding="utf-8") as f:
+                    all_index = json.load(f)
+            all_index[FASTGPT_DATASET_ID] = {"collections": self._index}
+            with open(INDEX_FILE, "w", encoding="utf-8") as f:
+                json.dump(all_index, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print(f"⚠️  Failed to save index {INDEX_FILE}: {e}")
 
-    def list_collections(self, search_text=""):
+    def list_collections(self, search_text="", use_cache=False):
         """
-        查询符合名称的集合 ID 列表
+        查询符合名称的集合 ID 列表(默认始终查询接口,并把结果写入本地索引)。
+        use_cache=True 且 search_text 与本地索引中的集合名完全一致时,直接返回缓存的 id,不请求 list 接口。
+        注意缓存命中为精确名称匹配(接口为不区分大小写的包含匹配),且 id 可能已被其它客户端删除/重建,
+        删除场景默认不走缓存。
         """
+        if use_cache and search_text in self._index:
+            print(f"📇 Using cached index for '{search_text}' (exact name match, may be stale)")
+            return list(self._index[search_text])
+
         url = f"{self.api_base}/core/dataset/collection/listV2"
         payload = {
             "datasetId": FASTGPT_DATASET_ID,
@@ -42,7 +83,7 @@ class FastGPTManager:
         }
 
         try:
-            resp = requests.post(url, headers=self.headers, json=payload, timeout=30)
+            resp = self.session.post(url, json=payload, timeout=30)
             if resp.status_code == 200:
                 data = resp.json()
                 if data.get("code") == 200:
@@ -55,14 +96,20 @@ class FastGPTManager:
                         items = res_data.get("data", res_data.get("list", []))
                     
                     # 过滤出名称精确匹配或包含匹配的项
+                    needle = search_text.lower()
                     matched_ids = []
                     for item in items:
-                        if search_text.lower() in item.get("name", "").lower():
+                        if needle in item.get("name", "").lower():
                             matched_ids.append({
                                 "id": item.get("_id"),
                                 "name": item.get("name"),
                                 "type": item.get("type")
                             })
+                    for m in matched_ids:
+                        entries = self._index.setdefault(m["name"], [])
+                        if all(e["id"] != m["id"] for e in entries):
+                            entries.append(m)
+                    self._save_index()
                     return matched_ids
             print(f"❌ List API Error: {resp.text[:200]}")
         except Exception as e:
@@ -72,43 +119,67 @@ class FastGPTManager:
     def delete_collections(self, collection_ids):
         """
         执行物理删除操作。
-        回退到之前成功验证过的版本：尝试逐个删除，
-        因为部分私有化环境对批量删除接口支持不一。
+        先尝试一次批量删除接口;部分私有化环境对批量删除接口支持不一,
+        失败时回退为逐个删除(线程池并发,每个 id 先 DELETE 再 POST 兼容旧版本)。
         """
         if not collection_ids:
             return False
-            
-        success_count = 0
-        for cid in collection_ids:
-            # 标准用法：DELETE 配合 id 参数
-            url = f"{self.api_base}/core/dataset/collection/delete?id={cid}"
-            try:
-                # 同时尝试 DELETE 和 POST 协议兼容性
-                resp = requests.delete(url, headers=self.headers, timeout=30)
-                if resp.status_code == 200:
-                    success_count += 1
-                else:
-                    # 尝试用 POST 兼容某些旧版本
-                    resp = requests.post(url, headers=self.headers, timeout=30)
-                    if resp.status_code == 200:
-                        success_count += 1
-                    else:
-                        print(f"❌ Failed to delete {cid}: {resp.status_code}")
-            except Exception as e:
-                print(f"❌ Exception deleting {cid}: {e}")
-        
-        return success_count == len(collection_ids)
+
+        url = f"{self.api_base}/core/dataset/collection/delete"
+        try:
+            resp = self.session.post(url, json={"ids": collection_ids}, timeout=30)
+            if resp.status_code == 200 and resp.json().get("code") == 200:
+                self._forget(collection_ids)
+                return True
+            print(f"⚠️  Batch delete unsupported ({resp.status_code}), falling back to per-id delete...")
+        except Exception as e:
+            print(f"⚠️  Batch delete failed ({e}), falling back to per-id delete...")
+
+        with ThreadPoolExecutor(max_workers=8) as ex:
+            results = list(ex.map(self._delete_one, collection_ids))
+        self._forget([cid for cid, ok in zip(collection_ids, results) if ok])
+        return all(results)
+
+    def _forget(self, deleted_ids):
+        """删除成功后从本地索引中移除对应条目"""
+        deleted = set(deleted_ids)
+        if not deleted:
+            return
+        for name in list(self._index):
+            kept = [e for e in self._index[name] if e["id"] not in deleted]
+            if kept:
+                self._index[name] = kept
+            else:
+                del self._index[name]
+        self._save_index()
+
+    def _delete_one(self, cid):
+        """删除单个集合:标准用法 DELETE 配合 id 参数,失败时用 POST 兼容某些旧版本"""
+        url = f"{self.api_base}/core/dataset/collection/delete?id={cid}"
+        try:
+            resp = self.session.delete(url, timeout=30)
+            if resp.status_code == 200:
+                return True
+            resp = self.session.post(url, timeout=30)
+            if resp.status_code == 200:
+                return True
+            print(f"❌ Failed to delete {cid}: {resp.status_code}")
+        except Exception as e:
+            print(f"❌ Exception deleting {cid}: {e}")
+        return False
 
 def main():
     parser = argparse.ArgumentParser(description="FastGPT Knowledge Base Deletion Tool")
     parser.add_argument("-q", "--query", type=str, required=True, help="Collection name to delete (e.g., 'history', 'zh')")
     parser.add_argument("--force", action="store_true", help="Delete without confirmation")
+    parser.add_argument("--use-index", action="store_true",
+                        help="Use the local name->id index on an exact-name match instead of querying the server (may be stale)")
     args = parser.parse_args()
 
     manager = FastGPTManager()
     
     print(f"\n🔍 Searching for collections matching: '{args.query}'...")
-    matches = manager.list_collections(args.query)
+    matches = manager.list_collections(args.query, use_cache=args.use_index)
     
     if not matches:
         print("No matching collections found.")
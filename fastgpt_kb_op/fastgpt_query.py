@@ -1,8 +1,11 @@
 import os
+import re
 import json
 import requests
 import argparse
+import time
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 from pathlib import Path
 
 # 加载环境变量
@@ -13,11 +16,17 @@ FASTGPT_BASE_URL = os.getenv("FASTGPT_BASE_URL", "").strip().rstrip("/")
 FASTGPT_API_KEY = os.getenv("FASTGPT_API_KEY", "").strip()
 FASTGPT_DATASET_ID = os.getenv("FASTGPT_DATASET_ID", "").strip()
 
+# list_collections 结果在进程内的缓存有效期(秒)
+CACHE_TTL = 30
+CACHE_MAX_ENTRIES = 128
+
+# 提取 URL 根(协议+域名),导入时编译一次
+_URL_ROOT_RE = re.compile(r'(https?://[^/]+)')
+
 class FastGPTQuery:
     def __init__(self):
         # 兼容标准 API 路径
-        import re
-        match = re.match(r'(https?://[^/]+)', FASTGPT_BASE_URL)
+        match = _URL_ROOT_RE.match(FASTGPT_BASE_URL)
         root = match.group(1) if match else FASTGPT_BASE_URL.rstrip('/')
         self.api_base = f"{root}/api"
         
@@ -25,11 +34,43 @@ class FastGPTQuery:
             "Authorization": f"Bearer {FASTGPT_API_KEY}",
             "Content-Type": "application/json"
         }
+        # 复用同一个 Session(keep-alive + 连接池)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # (parent_id, search_text, page_size, offset) -> (过期时间, 结果)
+        self._cache = {}
+
+    def invalidate_cache(self):
+        """清空查询缓存(创建/删除集合等修改操作后调用)"""
+        self._cache.clear()
 
-    def list_collections(self, parent_id=None, search_text="", page_size=20, offset=0):
+    def close(self):
+        """释放连接池"""
+        self.session.close()
+
+    def list_collections(self, parent_id=None, search_text="", page_size=20, offset=0, use_cache=True):
         """
-        调用 listV2 接口查询知识库集合列表
+        调用 listV2 接口查询知识库集合列表。
+        use_cache=True 时相同参数在 CACHE_TTL 秒内直接返回进程内缓存(仅缓存成功结果)。
         """
+        key = (parent_id, search_text, page_size, offset)
+        if use_cache:
+            hit = self._cache.get(key)
+            if hit and hit[0] > time.monotonic():
+                return hit[1]
+
+        result = self._list_collections_remote(parent_id, search_text, page_size, offset)
+        if use_cache and result is not None:
+            if len(self._cache) >= CACHE_MAX_ENTRIES:
+                self._cache.pop(next(iter(self._cache)))
+            self._cache[key] = (time.monotonic() + CACHE_TTL, result)
+        return result
+
+    def _list_collections_remote(self, parent_id, search_text, page_size, offset):
+        """实际请求 listV2 接口,失败返回 None"""
         url = f"{self.api_base}/core/dataset/collection/listV2"
         
         payload = {
@@ -46,7 +87,7 @@ class FastGPTQuery:
             print(f"[QUERY] Search: '{search_text}'")
 
         try:
-            resp = requests.post(url, headers=self.headers, json=payload, timeout=30)
+            resp = self.session.post(url, json=payload, timeout=30)
             if resp.status_code == 200:
                 data = resp.json()
                 if data.get("code") == 200:
@@ -64,13 +105,15 @@ def main():
     parser.add_argument("--search", type=str, default="", help="Search text for collections")
     parser.add_argument("--parent", type=str, default=None, help="Parent collection ID")
     parser.add_argument("--limit", type=int, default=20, help="Page size")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the in-process query cache")
     args = parser.parse_args()
 
     query_tool = FastGPTQuery()
     result = query_tool.list_collections(
         parent_id=args.parent, 
         search_text=args.search, 
-        page_size=args.limit
+        page_size=args.limit,
+        use_cache=not args.no_cache
     )
 
     if result:
@@ -1,13 +1,24 @@
+import functools
 import os
 import json
+import logging
 import hashlib
 import requests
 import time
 import argparse
 import re
+import queue
+import threading
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
+from typing import Tuple
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from lib.json_io import dumps as json_dumps, loads as json_loads
+from lib.retry import backoff_delay
 from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.cron import CronTrigger
 
@@ -15,21 +26,118 @@ from apscheduler.triggers.cron import CronTrigger
 load_dotenv()
 
 # ==================== 配置读取 ====================
-FASTGPT_BASE_URL = os.getenv("FASTGPT_BASE_URL", "").strip().rstrip("/")
-FASTGPT_API_KEY = os.getenv("FASTGPT_API_KEY", "").strip()
-FASTGPT_DATASET_ID = os.getenv("FASTGPT_DATASET_ID", "").strip()
+# FastGPT 标准 API 根路径从域名根构建(规避 /v1/ 等后缀干扰)
+_URL_ROOT_RE = re.compile(r'(https?://[^/]+)')
+
+
+def _parse_dirs(raw_val):
+    """
+    智能解析目录列表：支持标准 JSON 数组格式或逗号分隔字符串
+    """
+    if not raw_val:
+        return []
+    
+    # 尝试 JSON 解析
+    if raw_val.strip().startswith("[") and raw_val.strip().endswith("]"):
+        try:
+            parsed = json.loads(raw_val)
+            if isinstance(parsed, list):
+                return [p.strip() for p in parsed if p.strip()]
+        except ValueError:
+            pass # 解析失败则降级到逗号分隔
+    
+    # 降级处理：逗号分隔
+    return [d.strip() for d in raw_val.split(",") if d.strip()]
+
+
+@dataclass(frozen=True)
+class Config:
+    """同步配置:导入时从环境变量读取并解析一次,之后只读(上传线程间可安全共享)"""
+    base_url: str
+    api_base: str
+    api_key: str
+    dataset_id: str
+    local_dirs: Tuple[Path, ...]
+    cn_subdir: str
+    extensions: Tuple[str, ...]
+    ignore_patterns: str
+    state_db: Path
+    sync_time: str
+    tz: str
+    retry_times: int
+    retry_delay: int
+    upload_concurrency: int
+
+    @classmethod
+    def from_env(cls):
+        base_url = os.getenv("FASTGPT_BASE_URL", "").strip().rstrip("/")
+        url_root = _URL_ROOT_RE.match(base_url)
+        return cls(
+            base_url=base_url,
+            api_base=f"{url_root.group(1)}/api" if url_root else base_url,
+            api_key=os.getenv("FASTGPT_API_KEY", "").strip(),
+            dataset_id=os.getenv("FASTGPT_DATASET_ID", "").strip(),
+            local_dirs=tuple(Path(d) for d in _parse_dirs(os.getenv("FASTGPT_LOCAL_DIR", "./output"))),
+            cn_subdir=os.getenv("FASTGPT_CN_SUBDIR", "cn").strip(),
+            extensions=tuple(os.getenv("FASTGPT_FILE_EXTENSIONS", ".md,.pdf,.txt").strip().split(",")),
+            ignore_patterns=os.getenv("FASTGPT_IGNORE_PATTERNS", "").strip(),
+            state_db=Path(os.getenv("FASTGPT_SYNC_STATE_DB", "./data/fastgpt_sync_state.json").strip()),
+            sync_time=os.getenv("FASTGPT_DAILY_SYNC_TIME", "02:00").strip(),
+            tz=os.getenv("FASTGPT_TIMEZONE", "Asia/Shanghai").strip(),
+            retry_times=int(os.getenv("FASTGPT_PUSH_RETRY_TIMES", 3)),
+            retry_delay=int(os.getenv("FASTGPT_PUSH_RETRY_DELAY_SECONDS", 5)),
+            # 并发上传数(各文件上传互不依赖,网络 I/O 密集)
+            upload_concurrency=int(os.getenv("FASTGPT_UPLOAD_CONCURRENCY", 8)),
+        )
+
+
+CFG = Config.from_env()
+
+RETRY_MAX_DELAY = 30
+# 可重试的 HTTP 状态码;其它 4xx(参数/鉴权错误)重试也不会成功,直接失败
+RETRY_STATUS = (408, 429, 500, 502, 503, 504)
 
-FASTGPT_LOCAL_DIR = os.getenv("FASTGPT_LOCAL_DIR", "./output").strip()
-FASTGPT_CN_SUBDIR = os.getenv("FASTGPT_CN_SUBDIR", "cn").strip()
-FASTGPT_FILE_EXTENSIONS = os.getenv("FASTGPT_FILE_EXTENSIONS", ".md,.pdf,.txt").strip().split(",")
-FASTGPT_IGNORE_PATTERNS = os.getenv("FASTGPT_IGNORE_PATTERNS", "").strip()
+# 状态落盘间隔(每完成 N 个上传保存一次)
+STATE_SAVE_EVERY = 20
 
-SYNC_STATE_DB = os.getenv("FASTGPT_SYNC_STATE_DB", "./data/fastgpt_sync_state.json").strip()
-DAILY_SYNC_TIME = os.getenv("FASTGPT_DAILY_SYNC_TIME", "02:00").strip()
-TIMEZONE = os.getenv("FASTGPT_TIMEZONE", "Asia/Shanghai").strip()
+# 文件指纹算法(仅用于变更检测,无需密码学强度):优先 xxh3,否则 BLAKE2b-128
+try:
+    import xxhash
+    HASH_ALGO = "xxh3-64"
+    _new_hasher = xxhash.xxh3_64
+except ImportError:
+    HASH_ALGO = "blake2b-16"
+    _new_hasher = lambda: hashlib.blake2b(digest_size=16)
+LEGACY_HASH_ALGO = "md5"  # 旧状态文件中未标注 hashAlgo 的条目
 
-RETRY_TIMES = int(os.getenv("FASTGPT_PUSH_RETRY_TIMES", 3))
-RETRY_DELAY = int(os.getenv("FASTGPT_PUSH_RETRY_DELAY_SECONDS", 5))
+# 流式 multipart 上传(可选):requests 自带的 files= 会先把整个文件读入内存再发送
+try:
+    from requests_toolbelt import MultipartEncoder
+except ImportError:
+    MultipartEncoder = None
+
+# 集合命名:语言子目录向上取一级;根目录类名称归入默认集合
+_LANG_SUBDIRS = frozenset({CFG.cn_subdir, "zh", "en"})
+_ROOT_DIR_NAMES = frozenset({".", "/"})
+
+# 文件唯一标识:NCT 编号
+_NCT_RE = re.compile(r'NCT\d{8}')
+
+@functools.lru_cache(maxsize=4096)
+def _file_identity(filename):
+    """文件名 → 唯一标识(NCT 编号或原文件名),按文件名缓存(状态迁移与每轮扫描会重复查询)"""
+    nct_match = _NCT_RE.search(filename)
+    return nct_match.group(0) if nct_match else filename
+
+# 日志:时间戳由 formatter 统一添加;逐文件进度为 DEBUG,默认只输出告警与汇总
+# 使用独立 logger(不修改 root logger),被 main.py 进程内调用时不影响其它模块的输出
+log = logging.getLogger("fastgpt_sync")
+if not log.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s", datefmt="%Y-%m-%dT%H:%M:%S"))
+    log.addHandler(_handler)
+    log.propagate = False
+log.setLevel(os.getenv("FASTGPT_LOG_LEVEL", "INFO").strip().upper())
 
 # 全局上传过滤模式
 UPLOAD_FILTER_MODE = "today"  # "today" 或 "all"
@@ -39,85 +147,173 @@ class FastGPTSyncer:
         # 同时支持多种 Header 格式，增强兼容性
         # 在 Header 中注入 datasetId，解决部分私有化环境的路由校验问题
         self.headers = {
-            "Authorization": f"Bearer {FASTGPT_API_KEY}",
-            "apikey": FASTGPT_API_KEY,
-            "datasetId": FASTGPT_DATASET_ID,
+            "Authorization": f"Bearer {CFG.api_key}",
+            "apikey": CFG.api_key,
+            "datasetId": CFG.dataset_id,
             "Content-Type": "application/json"
         }
+        # 复用同一个 Session(keep-alive + 连接池),集合查询/创建与文件上传不再每次重新握手
+        # 连接池层只对幂等的 GET 做退避重试(遵循 Retry-After);POST(创建集合/上传)
+        # 由调用点自行处理,避免重复创建
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.headers["Connection"] = "keep-alive"
+        retry = Retry(total=CFG.retry_times, backoff_factor=1.0, status_forcelist=RETRY_STATUS,
+                      allowed_methods=frozenset(["GET"]), respect_retry_after_header=True,
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # 各接口完整 URL 构造时拼接一次(重试循环内不再重复格式化)
+        self.url_col_list = f"{CFG.api_base}/core/dataset/collection/list"
+        self.url_col_list_v2 = f"{CFG.api_base}/core/dataset/collection/listV2"
+        self.url_col_create = f"{CFG.api_base}/core/dataset/collection/create"
+        self.url_upload = f"{CFG.api_base}/core/dataset/collection/create/localFile"
+        self.url_ds_list = f"{CFG.api_base}/core/dataset/list"
         self.state = self._load_state()
+        self._state_lock = threading.Lock()
+        self._dirty = False  # 状态自上次落盘后是否有改动
+
+    def close(self):
+        """释放连接池"""
+        self.session.close()
 
     def _load_state(self):
-        path = Path(SYNC_STATE_DB)
-        if path.exists():
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except:
-                return {"files": {}}
-        return {"files": {}}
+        """
+        读取同步状态库 {"files": {identity: {...}}}。
+        每个条目的 "hashAlgo" 记录指纹算法;缺省视为旧版 MD5,在下次扫描时按 MD5 校验后迁移。
+        """
+        path = CFG.state_db
+        try:
+            return json_loads(path.read_bytes())
+        except (OSError, ValueError):
+            # 不存在/不可读/损坏(orjson 与标准库的解析错误均为 ValueError 子类)时从空状态开始
+            return {"files": {}}
 
     def _save_state(self):
-        path = Path(SYNC_STATE_DB)
+        """原子写入状态库:先写临时文件再 os.replace,避免中断时留下半截 JSON(orjson 优先)"""
+        path = CFG.state_db
         path.parent.mkdir(parents=True, exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_bytes(json_dumps(self.state))
+        os.replace(tmp, path)
+        self._dirty = False
 
-    def _get_file_hash(self, filepath):
-        hasher = hashlib.md5()
+    def _get_file_hash(self, filepath, hasher_factory=None, size_hint=None):
+        """
+        计算文件指纹(默认 HASH_ALGO)。
+        size_hint 为调用方已 stat 到的文件大小:不超过 1 MiB 时一次读完,不再分块循环;
+        否则 Python 3.11+ 用 hashlib.file_digest 在 C 层读取,更早版本按 1 MiB 分块读取。
+        """
+        hasher_factory = hasher_factory or _new_hasher
         with open(filepath, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
+            if size_hint is not None and size_hint <= (1 << 20):
+                hasher = hasher_factory()
+                hasher.update(f.read())
+                return hasher.hexdigest()
+            if hasattr(hashlib, "file_digest"):
+                return hashlib.file_digest(f, hasher_factory).hexdigest()
+            hasher = hasher_factory()
+            for chunk in iter(lambda: f.read(1 << 20), b""):
                 hasher.update(chunk)
         return hasher.hexdigest()
 
+    def _is_unchanged(self, file_state, file_path, file_hash, size_hint=None):
+        """
+        判断文件是否与状态库一致。
+        旧条目(MD5,无 hashAlgo)按 MD5 比对一次,一致则原地迁移到新算法,避免换算法后全量重传。
+        """
+        if not file_state:
+            return False
+        if file_state.get("hashAlgo", LEGACY_HASH_ALGO) == HASH_ALGO:
+            return file_state.get("hash") == file_hash
+        if file_state.get("hash") != self._get_file_hash(file_path, hashlib.md5, size_hint):
+            return False
+        file_state["hash"] = file_hash
+        file_state["hashAlgo"] = HASH_ALGO
+        self._dirty = True
+        return True
+
     def _get_api_base(self):
         """
-        强制从域名根路径构建 FastGPT 标准 API 路径，规避 /v1/ 等干扰
+        强制从域名根路径构建 FastGPT 标准 API 路径，规避 /v1/ 等干扰(导入时已预计算)
         """
-        # 提取协议和域名部分，忽略所有后缀
-        match = re.match(r'(https?://[^/]+)', FASTGPT_BASE_URL)
-        if match:
-            root = match.group(1)
-            return f"{root}/api"
-        return FASTGPT_BASE_URL.rstrip('/')
+        return CFG.api_base
 
     def _safe_json(self, resp):
         """
         安全解析 JSON，确保返回字典
         """
         try:
-            data = resp.json()
+            data = json_loads(resp.content)
             # 如果返回的是 JSON 字符串（多重编码），则解析它
             if isinstance(data, str):
                 try:
-                    import json
-                    data = json.loads(data)
-                except:
+                    data = json_loads(data)
+                except ValueError:
                     pass
             # 确保最终返回的是字典
             if isinstance(data, dict):
                 return data
             return {"data": data} # 包装一下，防止 .get() 失败
-        except:
+        except ValueError:
             return {}
 
-    def get_or_create_collection(self, name, parent_id=None):
+    def _prefetch_collections(self, page_size=200):
+        """
+        通过 listV2 分页拉取数据集根目录下的全部文件夹集合,返回 {name: _id}。
+        按实际返回条数推进 offset,直到取满响应中的 total(无 total 时直到返回空页),
+        服务端把 pageSize 限制得比请求值小时也不会漏页。
+        失败时返回 None(调用方回退为逐个名称查询)。
+        """
+        url = self.url_col_list_v2
+        folders = {}
+        offset = 0
+        try:
+            while True:
+                payload = {
+                    "datasetId": CFG.dataset_id,
+                    "parentId": None,
+                    "searchText": "",
+                    "pageSize": page_size,
+                    "offset": offset
+                }
+                resp = self.session.post(url, json=payload, timeout=30)
+                res_json = self._safe_json(resp) if resp.status_code == 200 else {}
+                if res_json.get("code") != 200:
+                    log.warning("Collection prefetch failed (HTTP %s), falling back to per-name lookup", resp.status_code)
+                    return None
+                # 兼容不同版本的返回格式 (list 或 data)
+                res_data = res_json.get("data", {})
+                items = res_data if isinstance(res_data, list) else res_data.get("data", res_data.get("list", []))
+                total = res_data.get("total") if isinstance(res_data, dict) else None
+                for item in items:
+                    if isinstance(item, dict) and item.get("type") == "folder":
+                        folders.setdefault(item.get("name"), item.get("_id"))
+                offset += len(items)
+                if not items or (isinstance(total, int) and offset >= total):
+                    return folders
+        except Exception as e:
+            log.warning("Collection prefetch error (%s), falling back to per-name lookup", e)
+            return None
+
+    def get_or_create_collection(self, name, parent_id=None, skip_lookup=False):
         """
         在 FastGPT 中查找或创建集合（目录）
+        skip_lookup=True 时跳过查找(已由 _prefetch_collections 确认不存在),直接创建
         """
-        api_base = self._get_api_base()
-        
         # 1. 查找是否存在
-        url = f"{api_base}/core/dataset/collection/list"
+        url = self.url_col_list
         params = {
-            "datasetId": FASTGPT_DATASET_ID,
+            "datasetId": CFG.dataset_id,
             "searchText": name
         }
         if parent_id:
             params["parentId"] = parent_id
 
         try:
-            resp = requests.get(url, headers=self.headers, params=params, timeout=30)
-            if resp.status_code == 200:
+            resp = None if skip_lookup else self.session.get(url, params=params, timeout=30)
+            if resp is not None and resp.status_code == 200:
                 res_json = self._safe_json(resp)
                 if res_json.get("code") == 200:
                     collections = res_json.get("data", [])
@@ -127,14 +323,14 @@ class FastGPTSyncer:
                                 return col.get("_id")
             
             # 2. 不存在则创建
-            create_url = f"{api_base}/core/dataset/collection/create"
+            create_url = self.url_col_create
             payload = {
-                "datasetId": FASTGPT_DATASET_ID,
+                "datasetId": CFG.dataset_id,
                 "parentId": parent_id if parent_id else None,
                 "name": name,
                 "type": "folder"
             }
-            resp = requests.post(create_url, headers=self.headers, json=payload, timeout=30)
+            resp = self.session.post(create_url, json=payload, timeout=30)
             if resp.status_code == 200:
                 res_json = self._safe_json(resp)
                 if res_json.get("code") == 200:
@@ -143,29 +339,28 @@ class FastGPTSyncer:
                         return data.get("_id") or data.get("collectionId")
                     return data # 如果 data 直接是 ID 字符串
             else:
-                print(f"Error creating collection {name}: {resp.status_code} - {resp.text[:100]}")
+                log.error("Error creating collection %s: %s - %s", name, resp.status_code, resp.text[:100])
         except Exception as e:
-            print(f"API Error (get_or_create_collection): {e}")
+            log.error("API Error (get_or_create_collection): %s", e)
         return None
 
     def upload_file(self, filepath, collection_id):
         """
-        适配官方 create/localFile 接口上传文件
+        适配官方 create/localFile 接口上传文件。
+        失败重试:408/429/5xx 与网络异常按指数退避 + 抖动重试(服务端给出 Retry-After 时优先遵循),
+        其它 4xx 直接失败。
         """
-        api_base = self._get_api_base()
-        url = f"{api_base}/core/dataset/collection/create/localFile"
+        url = self.url_upload
         
         file_path_obj = Path(filepath)
         
-        for attempt in range(RETRY_TIMES):
+        for attempt in range(CFG.retry_times):
+            retry_after = 0
             try:
                 with open(filepath, "rb") as f:
-                    files = {
-                        "file": (file_path_obj.name, f)
-                    }
                     # 严格按照官方示例参数
                     data_payload = {
-                        "datasetId": FASTGPT_DATASET_ID,
+                        "datasetId": CFG.dataset_id,
                         "parentId": collection_id,
                         "trainingType": "chunk",
                         "chunkSize": 512,
@@ -176,194 +371,315 @@ class FastGPTSyncer:
                     form_data = {
                         "data": json.dumps(data_payload)
                     }
-                    
-                    upload_headers = {
-                        "Authorization": f"Bearer {FASTGPT_API_KEY}",
-                        "apikey": FASTGPT_API_KEY,
-                        "datasetId": FASTGPT_DATASET_ID
-                    }
-                    
-                    resp = requests.post(url, headers=upload_headers, files=files, data=form_data, timeout=120)
+
+                    if MultipartEncoder is not None:
+                        # 流式上传:边读文件边发送,内存占用与文件大小无关
+                        encoder = MultipartEncoder(fields={
+                            **form_data,
+                            "file": (file_path_obj.name, f, "application/octet-stream")
+                        })
+                        upload_headers = {"Content-Type": encoder.content_type}
+                        resp = self.session.post(url, headers=upload_headers, data=encoder, timeout=120)
+                    else:
+                        # multipart 上传:去掉 Session 默认的 JSON Content-Type,由 requests 自动生成 boundary
+                        upload_headers = {"Content-Type": None}
+                        files = {
+                            "file": (file_path_obj.name, f)
+                        }
+                        resp = self.session.post(url, headers=upload_headers, files=files, data=form_data, timeout=120)
                     if resp.status_code == 200:
                         res_json = self._safe_json(resp)
                         if res_json.get("code") == 200:
-                            print(f"Successfully uploaded: {file_path_obj.name}")
+                            log.debug("Successfully uploaded: %s", file_path_obj.name)
                             return True
                         else:
-                            print(f"Upload API error: {res_json.get('message')}")
+                            log.warning("Upload API error: %s", res_json.get('message'))
+                    elif resp.status_code in RETRY_STATUS:
+                        log.warning("Upload failed (HTTP %s), will retry: %s", resp.status_code, resp.text[:200])
+                        retry_after = self._retry_after(resp)
                     else:
-                        print(f"Upload failed (HTTP {resp.status_code}): {resp.text[:200]}")
+                        log.error("Upload failed (HTTP %s): %s", resp.status_code, resp.text[:200])
+                        return False
+            except requests.RequestException as e:
+                log.warning("Upload exception: %s", e)
             except Exception as e:
-                print(f"Upload exception: {e}")
-            
-            if attempt < RETRY_TIMES - 1:
-                time.sleep(RETRY_DELAY)
+                log.warning("Upload exception: %s", e)
+                return False
+
+            if attempt < CFG.retry_times - 1:
+                time.sleep(max(backoff_delay(attempt, CFG.retry_delay, RETRY_MAX_DELAY),
+                               min(RETRY_MAX_DELAY, retry_after)))
         return False
 
+    def _retry_after(self, resp):
+        """读取响应头 Retry-After(秒),不存在或无法解析时返回 0"""
+        try:
+            return max(0, int(resp.headers.get("Retry-After", 0)))
+        except (TypeError, ValueError):
+            return 0
+
     def _diagnose_dataset(self):
         """
         诊断模式：列出当前 API Key 下所有可见的数据集，帮助排查 ID 错误
         """
-        api_base = self._get_api_base()
-        url = f"{api_base}/core/dataset/list"
-        print(f"[{datetime.now()}] [DIAGNOSIS] Probing datasets at: {url}")
+        url = self.url_ds_list
+        log.info("[DIAGNOSIS] Probing datasets at: %s", url)
         
         try:
-            resp = requests.get(url, headers=self.headers, timeout=20)
+            resp = self.session.get(url, timeout=20)
             if resp.status_code == 200:
                 data = resp.json().get("data", [])
                 if not data:
-                    print("[DIAGNOSIS] ⚠️ API Key 有效，但该账号下没有任何数据集。")
+                    log.warning("[DIAGNOSIS] ⚠️ API Key 有效，但该账号下没有任何数据集。")
                 else:
-                    print(f"[DIAGNOSIS] ✅ Success! Found {len(data)} datasets:")
+                    log.info("[DIAGNOSIS] ✅ Success! Found %d datasets:", len(data))
                     for ds in data:
-                        marker = "⭐ (MATCH)" if ds.get("_id") == FASTGPT_DATASET_ID else ""
-                        print(f"  - Name: {ds.get('name')}, ID: {ds.get('_id')} {marker}")
+                        marker = "⭐ (MATCH)" if ds.get("_id") == CFG.dataset_id else ""
+                        log.info("  - Name: %s, ID: %s %s", ds.get('name'), ds.get('_id'), marker)
             else:
-                print(f"[DIAGNOSIS] ❌ Failed (HTTP {resp.status_code}): {resp.text[:200]}")
+                log.error("[DIAGNOSIS] ❌ Failed (HTTP %s): %s", resp.status_code, resp.text[:200])
         except Exception as e:
-            print(f"[DIAGNOSIS] ❌ Error: {e}")
+            log.error("[DIAGNOSIS] ❌ Error: %s", e)
 
-    def _parse_dirs(self, raw_val):
+    def _get_file_identity(self, filename):
         """
-        智能解析目录列表：支持标准 JSON 数组格式或逗号分隔字符串
+        提取文件唯一标识：优先提取 NCT 编号（不含后缀），否则使用完整文件名
         """
-        if not raw_val:
-            return []
-        
-        # 尝试 JSON 解析
-        if raw_val.strip().startswith("[") and raw_val.strip().endswith("]"):
-            try:
-                import json
-                parsed = json.loads(raw_val)
-                if isinstance(parsed, list):
-                    return [p.strip() for p in parsed if p.strip()]
-            except:
-                pass # 解析失败则降级到逗号分隔
-        
-        # 降级处理：逗号分隔
-        return [d.strip() for d in raw_val.split(",") if d.strip()]
+        return _file_identity(filename)
 
-    def _get_file_identity(self, filename):
+    def _iter_zh_markdown(self, root):
         """
-        提取文件唯一标识：优先提取 NCT 编号（不含后缀），否则使用完整文件名
+        os.scandir 迭代式深度遍历 root,按文件名过滤后产出 DirEntry。
+        【核心过滤】：.md 文件名必须含有 "-zh" 且排除系统干扰文件;不跟随符号链接。
+        以 bytes 路径遍历:DirEntry.name/path 直接是 bytes,过滤时不做 Unicode 解码,
+        被拒绝的条目既不解码也不构造 Path;DirEntry 的 stat 结果由调用方复用。
         """
-        nct_match = re.search(r'NCT\d{8}', filename)
-        if nct_match:
-            return nct_match.group(0)
-        return filename
+        stack = [os.fsencode(root)]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for entry in it:
+                        name = entry.name
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif (name.endswith(b".md") and b"-zh" in name
+                              and b".DS_Store" not in name and entry.is_file()):
+                            yield entry
+            except OSError as e:
+                log.warning("Cannot scan %s: %s", e.filename, e)
 
     def sync_once(self):
-        print(f"[{datetime.now()}] Starting sync...")
+        log.info("Starting sync...")
         
         # 1. 状态平滑迁移：将旧的以文件名作为 Key 的状态，转换为以 NCT/Identity 作为 Key
         migrated_files = {}
         original_files = self.state.get("files", {})
-        print(f"[{datetime.now()}] Current state contains {len(original_files)} records.")
+        log.info("Current state contains %d records.", len(original_files))
         
         for key, val in original_files.items():
             # 这里必须确保 key 被正确转换
             new_identity = self._get_file_identity(key)
+            if new_identity != key:
+                self._dirty = True
             if new_identity not in migrated_files:
                 if "filename" not in val:
                     val["filename"] = key
+                    self._dirty = True
                 migrated_files[new_identity] = val
             else:
                 # 如果已经存在（例如 NCT06959615.md 和 2026...NCT06959615-zh.md）
                 # 我们可以合并或保留最新的，这里选择保留已有的（通常是更规范的标识）
                 pass
         
-        # 强制更新状态，无论数量是否变化（因为我们想把 Key 从 .md 变成纯 NCT）
-        print(f"[{datetime.now()}] Migration: Converting keys to clean identities.")
+        # 把 Key 从 .md 变成纯 NCT;稳态运行时 Key 已规范,迁移结果与原状态一致,无需落盘
+        if self._dirty:
+            log.info("Migration: Converting keys to clean identities.")
         self.state["files"] = migrated_files
-        self._save_state()
 
+        # 扫描/上传期间按批落盘,结束(含异常退出)时有变化才刷新一次
+        try:
+            added, modified, skipped = self._scan_and_upload()
+        finally:
+            if self._dirty:
+                self._save_state()
+
+        log.info("Sync complete: ✅ Added: %d, Modified: %d, Skipped: %d", added, modified, skipped)
+
+    def _upload_worker(self, jobs, stats, sync_start_iso):
+        """
+        上传消费者:从队列取任务上传,成功后在锁内更新状态并按批落盘;收到 None 退出。
+        单个任务的任何异常只记录日志,线程继续消费队列(否则生产者会阻塞在有界队列上)。
+        """
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            try:
+                self._process_job(job, stats, sync_start_iso)
+            except Exception:
+                log.exception("Upload job failed: %s", job[0])
+
+    def _process_job(self, job, stats, sync_start_iso):
+        """上传单个文件并记录状态"""
+        file_path, collection_id, file_identity, file_hash, filename, source_path, existed, st = job
+        if not self.upload_file(file_path, collection_id):
+            return
+        with self._state_lock:
+            self.state["files"][file_identity] = {
+                "filename": filename,
+                "hash": file_hash,
+                "hashAlgo": HASH_ALGO,
+                "mtimeNs": st.st_mtime_ns,
+                "size": st.st_size,
+                "uploadTime": sync_start_iso,
+                "collectionId": collection_id,
+                "sourcePath": source_path
+            }
+            self._dirty = True
+            stats["modified" if existed else "added"] += 1
+            if (stats["added"] + stats["modified"]) % STATE_SAVE_EVERY == 0:
+                self._save_state()
+
+    def _scan_and_upload(self):
+        """
+        扫描所有根目录、过滤出变化的文件并上传,返回 (added, modified, skipped)。
+        先只做遍历 + 日期过滤 + stat 快速路径收集候选;没有候选时直接返回,不预取集合、不启动上传线程。
+        有候选时走流水线:当前线程作为生产者(指纹 + 解析集合 ID,集合缓存保持单线程),
+        CFG.upload_concurrency 个上传线程从有界队列消费,磁盘读取与网络上传相互重叠。
+        """
         # 2. 支持多根目录智能解析
-        raw_val = os.getenv("FASTGPT_LOCAL_DIR", "./output")
-        roots = [Path(d) for d in self._parse_dirs(raw_val)]
+        roots = CFG.local_dirs
         
-        added, modified, skipped = 0, 0, 0
-        collection_cache = {} # 集合 ID 缓存，避免重复 API 调用
+        stats = {"added": 0, "modified": 0}
+        # 本轮同步的基准时间只取一次:日期过滤在整轮内保持一致(跨零点运行也不会前后不一)
+        sync_start = datetime.now()
+        today_str = sync_start.strftime("%Y-%m-%d")
+        sync_start_iso = sync_start.isoformat()
+
+        candidates, skipped = self._collect_candidates(roots, today_str)
+        if not candidates:
+            log.info("Nothing to sync.")
+            return 0, 0, skipped
+
+        # 集合 ID 缓存:先用 listV2 一次性预取已有文件夹,只有真正缺失的名称才请求创建
+        prefetched = self._prefetch_collections()
+        collection_cache = dict(prefetched or {})
+
+        # 3. 上传线程先启动,处理到一个变化文件即可开始上传(有界队列限制内存占用)
+        jobs = queue.Queue(maxsize=64)
+        workers = [threading.Thread(target=self._upload_worker, args=(jobs, stats, sync_start_iso), daemon=True)
+                   for _ in range(max(1, CFG.upload_concurrency))]
+        for w in workers:
+            w.start()
+        try:
+            skipped += self._produce_jobs(candidates, jobs, prefetched, collection_cache)
+        finally:
+            for _ in workers:
+                jobs.put(None)
+            for w in workers:
+                w.join()
+
+        return stats["added"], stats["modified"], skipped
 
+    def _collect_candidates(self, roots, today_str):
+        """
+        遍历各根目录,经日期过滤与 mtime + size 快速路径后返回 (候选列表, 跳过数)。
+        候选为 (root, entry, file_identity, file_state, st),只做 stat 不读文件内容。
+        """
+        candidates = []
+        skipped = 0
+        today_prefix = today_str.encode() if UPLOAD_FILTER_MODE == "today" else None
         for root in roots:
             if not root.exists():
-                print(f"Warning: Local dir {root} not found, skipping...")
+                log.warning("Local dir %s not found, skipping...", root)
                 continue
             
-            print(f"[{datetime.now()}] Scanning source: {root}")
-            
-            # 策略：递归扫描所有包含 "-zh" 的 md 文件
-            # 使用 rglob("*") 遍历所有深度，不再局限于 cn 子目录
-            all_files = [f for f in root.rglob("*") if f.is_file() and f.suffix == ".md"]
+            log.info("Scanning source: %s", root)
             
-            for file_path in all_files:
-                filename = file_path.name
-                
-                # 【核心过滤】：文件名必须含有 "-zh" 且排除系统干扰文件
-                if "-zh" not in filename or ".DS_Store" in filename:
+            # 策略：递归扫描所有包含 "-zh" 的 md 文件(遍历所有深度，不再局限于 cn 子目录)
+            for entry in self._iter_zh_markdown(root):
+                # 【日期过滤】：根据模式决定是否过滤历史文件(bytes 前缀比较,通过后才解码文件名)
+                if today_prefix is not None and not entry.name.startswith(today_prefix):
+                    skipped += 1
                     continue
-                
-                # 【日期过滤】：根据模式决定是否过滤历史文件
-                if UPLOAD_FILTER_MODE == "today":
-                    today_str = datetime.now().strftime("%Y-%m-%d")
-                    if not filename.startswith(today_str):
-                        skipped += 1
-                        continue
-                
+                filename = os.fsdecode(entry.name)
+
                 # 【智能去重标识】：提取 NCT 编号或使用文件名作为 ID
                 file_identity = self._get_file_identity(filename)
-                file_hash = self._get_file_hash(file_path)
-                
-                # 【去重逻辑】：基于标识符（NCT/文件名）和内容指纹（Hash）双重校验
                 file_state = self.state["files"].get(file_identity)
-                
-                if file_state and file_state.get("hash") == file_hash:
+
+                # 【快速路径】：mtime + size 与状态库一致时视为未变化,不读文件计算指纹
+                st = entry.stat()
+                if (file_state and file_state.get("mtimeNs") == st.st_mtime_ns
+                        and file_state.get("size") == st.st_size):
                     skipped += 1
                     continue
-                
-                # 智能确定集合名称 (Collection Name)
-                # 策略：默认取父目录名，若是技术子目录则向上溯源，若是历史路径则强制归类
-                collection_name = file_path.parent.name
-                
-                if collection_name in [FASTGPT_CN_SUBDIR, "zh", "en"]:
-                    collection_name = file_path.parent.parent.name
-                
-                if "history" in file_path.parts:
-                    collection_name = "history"
-                
-                # 如果 collection_name 提取失败或仍是根目录，则使用 root 的文件夹名
-                if not collection_name or collection_name in [".", "/", root.name]:
-                    collection_name = "Default_Collection"
-
-                if collection_name in collection_cache:
-                    collection_id = collection_cache[collection_name]
-                else:
-                    collection_id = self.get_or_create_collection(collection_name)
-                    if collection_id:
-                        collection_cache[collection_name] = collection_id
-                
-                if not collection_id:
-                    print(f"Skipping {filename} due to collection error ({collection_name}).")
-                    continue
 
-                action = "Updating" if file_state else "Adding"
-                print(f"[{datetime.now()}] {action}: {filename} (in {collection_name})")
-                
-                if self.upload_file(file_path, collection_id):
-                    self.state["files"][file_identity] = {
-                        "filename": filename,
-                        "hash": file_hash,
-                        "uploadTime": datetime.now().isoformat(),
-                        "collectionId": collection_id,
-                        "sourcePath": str(file_path.relative_to(root))
-                    }
-                    if file_state:
-                        modified += 1
-                    else:
-                        added += 1
-                    self._save_state()
-                
-        print(f"[{datetime.now()}] Sync complete: ✅ Added: {added}, Modified: {modified}, Skipped: {skipped}")
+                candidates.append((root, entry, file_identity, file_state, st))
+        return candidates, skipped
+
+    def _produce_jobs(self, candidates, jobs, prefetched, collection_cache):
+        """上传生产者:对候选文件计算指纹、解析集合 ID,把上传任务放入队列,返回跳过的文件数"""
+        skipped = 0
+        for root, entry, file_identity, file_state, st in candidates:
+            filename = os.fsdecode(entry.name)
+            file_path = Path(os.fsdecode(entry.path))
+
+            # 【去重逻辑】：基于标识符（NCT/文件名）和内容指纹（Hash）双重校验
+            file_hash = self._get_file_hash(file_path, size_hint=st.st_size)
+            if self._is_unchanged(file_state, file_path, file_hash, st.st_size):
+                # 内容未变(仅被 touch 等):刷新 stat 签名,下次直接走快速路径
+                with self._state_lock:
+                    file_state["mtimeNs"] = st.st_mtime_ns
+                    file_state["size"] = st.st_size
+                    self._dirty = True
+                skipped += 1
+                continue
+            
+            # 智能确定集合名称 (Collection Name)
+            # 策略：默认取父目录名，若是技术子目录则向上溯源，若是历史路径则强制归类
+            # (路径只拆分一次,父/祖父目录名与 history 判断都基于同一个 parts)
+            parts = file_path.parts
+            collection_name = parts[-2] if len(parts) >= 2 else ""
+            
+            if collection_name in _LANG_SUBDIRS:
+                collection_name = parts[-3] if len(parts) >= 3 else ""
+            
+            if "history" in parts:
+                collection_name = "history"
+            
+            # 如果 collection_name 提取失败或仍是根目录，则使用 root 的文件夹名
+            if not collection_name or collection_name in _ROOT_DIR_NAMES or collection_name == root.name:
+                collection_name = "Default_Collection"
+
+            if collection_name in collection_cache:
+                collection_id = collection_cache[collection_name]
+            else:
+                collection_id = self.get_or_create_collection(collection_name,
+                                                              skip_lookup=prefetched is not None)
+                if collection_id:
+                    collection_cache[collection_name] = collection_id
+            
+            if not collection_id:
+                log.warning("Skipping %s due to collection error (%s).", filename, collection_name)
+                continue
+
+            action = "Updating" if file_state else "Adding"
+            log.debug("%s: %s (in %s)", action, filename, collection_name)
+            jobs.put((file_path, collection_id, file_identity, file_hash, filename,
+                      os.path.relpath(file_path, root), bool(file_state), st))
+
+        return skipped
+
+def run_once(mode="today"):
+    """按指定上传模式执行一次同步(供 main.py 进程内调用,等价于 --once --mode=...)"""
+    global UPLOAD_FILTER_MODE
+    UPLOAD_FILTER_MODE = mode
+    syncer = FastGPTSyncer()
+    try:
+        syncer.sync_once()
+    finally:
+        syncer.close()
 
 def main():
     parser = argparse.ArgumentParser(description="FastGPT Local Knowledge Base Syncer")
@@ -380,16 +696,21 @@ def main():
     UPLOAD_FILTER_MODE = args.mode
 
     if args.once:
-        syncer.sync_once()
+        try:
+            syncer.sync_once()
+        finally:
+            syncer.close()
     elif args.daemon:
-        print(f"[{datetime.now()}] Scheduler started. Sync time: {DAILY_SYNC_TIME}, Timezone: {TIMEZONE}")
-        scheduler = BlockingScheduler(timezone=TIMEZONE)
-        hour, minute = DAILY_SYNC_TIME.split(":")
+        log.info("Scheduler started. Sync time: %s, Timezone: %s", CFG.sync_time, CFG.tz)
+        scheduler = BlockingScheduler(timezone=CFG.tz)
+        hour, minute = CFG.sync_time.split(":")
         scheduler.add_job(syncer.sync_once, CronTrigger(hour=hour, minute=minute))
         try:
             scheduler.start()
         except (KeyboardInterrupt, SystemExit):
             pass
+        finally:
+            syncer.close()
     else:
         parser.print_help()
 
@@ -4,6 +4,11 @@ lib - 公共模块包
 提供可复用的核心能力,供主程序和各渠道模块集成:
 - text_utils:  文本处理工具(文件名清洗、Markdown 转纯文本、分批、列表配置解析)
 - llm_client:  LLM 客户端工厂与翻译(消除多文件 LLM 配置副本)
+- rate_limiter: 请求数 + token 数双桶限流器(LLM 调用前预占额度)
+- http_client: 进程级共享 requests.Session(keep-alive + 连接池)
+- retry:       指数退避重试装饰器(429/5xx/连接错误,支持 Retry-After)
+- translation_cache: 翻译结果缓存(SQLite 持久化 + 并发去重 + 静态词表)
+- json_io:     JSON 文件读写(优先 orjson,回退标准库)
 - ctgov_api:   ClinicalTrials.gov 统一抓取(支持 china/top/latest 过滤)
 - study_data:  试验数据清洗与本地落地
 - channels:    推送渠道包(telegram / gewe / feishu / fastgpt)
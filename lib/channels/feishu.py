@@ -14,9 +14,9 @@ import json
 import os
 from datetime import datetime
 
-import requests
 from dotenv import load_dotenv
 
+from lib.http_client import SESSION
 from lib.text_utils import parse_list_config
 from lib.llm_client import translate_text
 from lib.ctgov_api import has_china_center, get_nct_id
@@ -41,7 +41,7 @@ def get_access_token():
     url = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal"
     payload = {"app_id": FEISHU_APP_ID, "app_secret": FEISHU_APP_SECRET}
     try:
-        response = requests.post(url, json=payload, timeout=10)
+        response = SESSION.post(url, json=payload, timeout=10)
         data = response.json()
         if data.get("code") == 0:
             return data.get("tenant_access_token")
@@ -114,7 +114,7 @@ def send_card(token, chat_id, data):
     payload = {"receive_id": chat_id, "msg_type": "interactive", "content": json.dumps(card)}
     headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json; charset=utf-8"}
     try:
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
+        response = SESSION.post(url, json=payload, headers=headers, timeout=10)
         res_data = response.json()
         if res_data.get("code") == 0:
             print(f"[{datetime.now()}] Feishu card sent to {chat_id}: {data['nct_id']}")
@@ -24,10 +24,11 @@ import os
 import time
 from datetime import datetime
 
-import requests
 from dotenv import load_dotenv
 from xml.sax.saxutils import escape
 
+from lib.ctgov_api import has_china_center
+from lib.http_client import SESSION
 from lib.text_utils import markdown_to_plain, split_text_by_len, parse_list_config
 from lib.llm_client import translate_text
 
@@ -69,7 +70,7 @@ def _request(path, payload, to_wxid=None):
 
     for attempt in range(GEWE_PUSH_RETRY_TIMES):
         try:
-            resp = requests.post(url, headers=headers, json=body, timeout=15)
+            resp = SESSION.post(url, headers=headers, json=body, timeout=15)
             if resp.status_code == 200:
                 res_data = resp.json()
                 if res_data.get("ret") == 200:
@@ -130,7 +131,7 @@ def build_appmsg(study):
 
     # 中国中心判断
     locations = contacts_locations.get("locations", [])
-    has_china = any(loc.get("country") == "China" for loc in locations)
+    has_china = has_china_center(study)
 
     # 联系人
     contact_name, contact_phone, contact_email = "未知", "未知", "未知"
@@ -11,10 +11,11 @@ telegram - Telegram 消息推送渠道
 
 import os
 
-import requests
 import urllib3
 from dotenv import load_dotenv
 
+from lib.http_client import SESSION
+from lib.retry import retry_with_backoff
 from lib.text_utils import split_text_by_len
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -33,6 +34,14 @@ def _enabled_check():
     return True
 
 
+@retry_with_backoff(max_tries=5, base=1.0, cap=30.0)
+def _post(url, payload):
+    """发送单条消息;429/5xx/连接错误按指数退避重试(遵循 Retry-After)"""
+    resp = SESSION.post(url, json=payload, timeout=15, verify=False)
+    resp.raise_for_status()
+    return resp
+
+
 def send_msg(text):
     """
     发送消息到 Telegram。超长消息自动分批(优先在换行处切分),每批加 (续 i/n) 尾标。
@@ -43,7 +52,7 @@ def send_msg(text):
     parts = split_text_by_len(text, MAX_TG_MSG_LEN)
     for part in parts:
         try:
-            requests.post(url, json={"chat_id": TG_CHAT_ID, "text": part}, timeout=15, verify=False)
+            _post(url, {"chat_id": TG_CHAT_ID, "text": part})
         except Exception as e:
             print(f"Error sending Telegram message: {e}")
 
@@ -22,8 +22,8 @@ from datetime import datetime
 
 from dotenv import load_dotenv
 
-from lib.ctgov_api import has_china_center, get_nct_id
-from lib.llm_client import translate_text as translate_to_chinese
+from lib.ctgov_api import has_china_center, get_nct_id, dget
+from lib.llm_client import translate_text as translate_to_chinese, translate_many
 from lib.study_data import sanitize_filename, save_study_json
 from lib.text_utils import parse_list_config
 from lib.branding import get_title, get_footer, disease_cn_name
@@ -33,29 +33,40 @@ load_dotenv()
 SEARCH_CONDITION = os.getenv("SEARCH_CONDITION", "Pancreatic Cancer")
 
 
-def format_study_detail(study):
+def translation_texts(study):
+    """返回单个试验需要翻译的文本:(简短标题, 标题+正式标题, 适应症)"""
+    brief_title = dget(study, "protocolSection", "identificationModule", "briefTitle")
+    official_title = dget(study, "protocolSection", "identificationModule", "officialTitle")
+    conditions = dget(study, "protocolSection", "conditionsModule", "conditions", default=["N/A"])
+    return brief_title, f"{brief_title} ({official_title})", ", ".join(conditions)
+
+
+def lookup_translation(text, translations):
+    """优先从预翻译缓存取译文,未命中再单独请求 LLM"""
+    if translations and text in translations:
+        return translations[text]
+    return translate_to_chinese(text)
+
+
+def format_study_detail(study, translations=None):
     """
     格式化单个试验的详情文本,并落地 JSON。
     返回 (detail_text, translated_info) 元组。
+    translations 为预先并发翻译好的 {原文: 译文} 缓存,命中时不再请求 LLM。
     """
-    protocol = study.get("protocolSection", {})
-    identification = protocol.get("identificationModule", {})
-    status_module = protocol.get("statusModule", {})
-    design_module = protocol.get("designModule", {})
-    conditions_module = protocol.get("conditionsModule", {})
-    contacts_locations = protocol.get("contactsLocationsModule", {})
-
-    nct_id = identification.get("nctId", "N/A")
-    brief_title = identification.get("briefTitle", "N/A")
-    official_title = identification.get("officialTitle", "N/A")
-    overall_status = status_module.get("overallStatus", "招募中")
-    phases = design_module.get("phases", ["N/A"])
-    conditions = conditions_module.get("conditions", ["N/A"])
+    protocol = study.get("protocolSection")
+
+    nct_id = dget(protocol, "identificationModule", "nctId")
+    brief_title = dget(protocol, "identificationModule", "briefTitle")
+    official_title = dget(protocol, "identificationModule", "officialTitle")
+    overall_status = dget(protocol, "statusModule", "overallStatus", default="招募中")
+    phases = dget(protocol, "designModule", "phases", default=["N/A"])
+    conditions = dget(protocol, "conditionsModule", "conditions", default=["N/A"])
 
     has_china = has_china_center(study)
     china_tag = "[🇨🇳 中国有中心] " if has_china else ""
 
-    central_contacts = contacts_locations.get("centralContacts", [])
+    central_contacts = dget(protocol, "contactsLocationsModule", "centralContacts", default=[])
     contact_info = "无"
     if central_contacts:
         c = central_contacts[0]
@@ -64,9 +75,9 @@ def format_study_detail(study):
                         f"电话: {c.get('phone', '无')}\n"
                         f"邮箱: {c.get('email', '无')}")
 
-    translated_title = translate_to_chinese(f"{brief_title} ({official_title})")
+    translated_title = lookup_translation(f"{brief_title} ({official_title})", translations)
     translated_status = "招募中" if overall_status == "RECRUITING" else overall_status
-    translated_conditions = translate_to_chinese(", ".join(conditions))
+    translated_conditions = lookup_translation(", ".join(conditions), translations)
 
     translated_info = {
         "title_cn": translated_title,
@@ -120,6 +131,10 @@ def build_push_content(studies, auto_save_json=True, condition=None):
     study_details = []  # 每个试验的 (nct_id, detail_text, translated_info)
     total = len(studies)
 
+    # 一次性并发翻译所有试验的标题/适应症,后续汇总和详情直接查缓存
+    print(f"[{datetime.now()}] 并发翻译 {total} 个试验...")
+    translations = translate_many(text for study in studies for text in translation_texts(study))
+
     with open(report_file, "w", encoding="utf-8") as rf:
         rf.write(f"# {get_title(effective_condition)} ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})\n\n")
         rf.write(f"## 🔬 {disease_cn_name(effective_condition)}临床试验每日更新\n\n")
@@ -131,11 +146,10 @@ def build_push_content(studies, auto_save_json=True, condition=None):
         # 汇总清单
         for i, study in enumerate(studies):
             nct_id = get_nct_id(study)
-            brief_title = study.get("protocolSection", {}).get("identificationModule", {}).get("briefTitle", "N/A")
+            brief_title = dget(study, "protocolSection", "identificationModule", "briefTitle")
             china_marker = "🇨🇳 " if has_china_center(study) else ""
 
-            print(f"[{datetime.now()}] 翻译 {i+1}/{total}: {nct_id}")
-            translated_brief = translate_to_chinese(brief_title)
+            translated_brief = lookup_translation(brief_title, translations)
 
             line = f"- {china_marker}标题：{translated_brief}\n  ❤️ 编号: {nct_id}\n  🔗 链接: https://clinicaltrials.gov/study/{nct_id}\n\n"
             summary_msg += line
@@ -158,7 +172,7 @@ def build_push_content(studies, auto_save_json=True, condition=None):
                 current_idx = i + j + 1
                 nct_id = get_nct_id(study)
                 print(f"[{datetime.now()}] 处理详情 {current_idx}/{total}: {nct_id}")
-                detail_text, translated_info = format_study_detail(study)
+                detail_text, translated_info = format_study_detail(study, translations)
                 group_details += f"### --- 临床基本信息 ({current_idx}/{total}) ---\n"
                 group_details += detail_text + "\n"
                 study_details.append((nct_id, detail_text, translated_info, study))
@@ -2,7 +2,7 @@
 ctgov_api - ClinicalTrials.gov 统一抓取
 
 基于 CTGov API v2,统一了原 daily_ctgov_check_tgbot.py 的 fetch_clinical_trials()
-和 manus_subscript.py 的 get_clinical_trials() 两份独立实现。
+和 manus_subscript.py 原 get_clinical_trials() 两份独立实现。
 
 支持灵活的查询过滤:
 - condition:  疾病条件(默认从 .env 读 SEARCH_CONDITION)
@@ -11,7 +11,7 @@ ctgov_api - ClinicalTrials.gov 统一抓取
 - china_only: 仅抓取含中国中心的试验(用 AREA[LocationCountry]China)
 - sort:       排序(默认 LastUpdatePostDate:desc,即最近更新优先)
 - top:        取前 N 个(等价于 pageSize=N)
-- days_back:  时间窗,仅保留最近 N 天内更新的(本地过滤)
+- days_back:  时间窗,仅保留最近 N 天内更新的(服务端 AREA[LastUpdatePostDate]RANGE 过滤)
 
 环境变量(作为默认值,可被函数参数覆盖):
     SEARCH_CONDITION  疾病条件(默认 "Pancreatic Cancer")
@@ -27,6 +27,8 @@ import requests
 import urllib3
 from dotenv import load_dotenv
 
+from lib.http_client import SESSION
+from lib.retry import retry_with_backoff
 from lib.text_utils import parse_list_config
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -44,6 +46,14 @@ BASE_URL = "https://clinicaltrials.gov/api/v2/studies"
 UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 
 
+@retry_with_backoff(max_tries=5, base=1.0, cap=30.0)
+def _get_studies(params, headers):
+    """请求 CTGov API 并返回 studies 列表;429/5xx/连接错误按指数退避重试"""
+    response = SESSION.get(BASE_URL, params=params, headers=headers, verify=False, timeout=30)
+    response.raise_for_status()
+    return response.json().get("studies", [])
+
+
 def fetch_studies(condition=None, keywords=None, status=None,
                   china_only=False, sort="LastUpdatePostDate:desc",
                   top=None, days_back=None):
@@ -57,10 +67,11 @@ def fetch_studies(condition=None, keywords=None, status=None,
         china_only: True 时加 AREA[LocationCountry]China 过滤,只抓中国试验
         sort:       排序字段。默认 LastUpdatePostDate:desc(最近更新优先);None 则不排序
         top:        取前 N 个(设置 pageSize=N)。None 时默认 pageSize=50
-        days_back:  时间窗过滤。>0 时仅保留最近 N 天内更新的(本地过滤);None/0 时不过滤
+        days_back:  时间窗过滤。>0 时仅保留最近 N 天内更新的(服务端 filter.advanced 过滤,
+                    服务端拒绝该表达式时回退本地过滤);None/0 时不过滤
 
     返回:
-        原始 study 对象列表(完整 protocolSection 结构)。失败返回 []。
+        原始 study 对象列表(完整 protocolSection 结构,附带 "_has_china" 标记)。失败返回 []。
     """
     condition = condition if condition is not None else _DEFAULT_CONDITION
     keywords = keywords if keywords is not None else _DEFAULT_KEYWORDS
@@ -73,49 +84,85 @@ def fetch_studies(condition=None, keywords=None, status=None,
         params["query.term"] = " OR ".join(keywords)
     if status:
         params["filter.overallStatus"] = status
-    if china_only:
-        params["filter.advanced"] = "AREA[LocationCountry]China"
     if sort:
         params["sort"] = sort
     params["pageSize"] = top if (top and top > 0) else 50
     params["format"] = "json"
 
+    # filter.advanced 表达式:中国中心 + 时间窗(服务端过滤,只下载窗口内的试验)
+    advanced = ["AREA[LocationCountry]China"] if china_only else []
+    date_cutoff = None
+    if days_back and days_back > 0:
+        date_cutoff = (datetime.now() - timedelta(days=days_back)).strftime('%Y-%m-%d')
+        advanced.append(f"AREA[LastUpdatePostDate]RANGE[{date_cutoff},MAX]")
+    if advanced:
+        params["filter.advanced"] = " AND ".join(advanced)
+
     headers = {"User-Agent": UA, "Accept": "application/json"}
 
     try:
-        response = requests.get(BASE_URL, params=params, headers=headers, verify=False, timeout=30)
-        response.raise_for_status()
-        all_studies = response.json().get("studies", [])
+        return _mark_china(_get_studies(params, headers))
+    except requests.HTTPError as e:
+        if date_cutoff is None or getattr(e.response, "status_code", None) != 400:
+            print(f"Error fetching data from CTGov: {e}")
+            return []
+        # 服务端不接受日期表达式时,回退为不带时间窗的查询 + 本地过滤
+        print(f"⚠️  CTGov 不支持服务端日期过滤,回退本地过滤: {e}")
     except Exception as e:
         print(f"Error fetching data from CTGov: {e}")
         return []
 
-    # 本地时间窗过滤(days_back > 0 时)
-    if days_back and days_back > 0:
-        date_cutoff = (datetime.now() - timedelta(days=days_back)).strftime('%Y-%m-%d')
-        filtered = []
-        for s in all_studies:
-            last_update = (s.get("protocolSection", {})
-                             .get("statusModule", {})
-                             .get("lastUpdatePostDateStruct", {})
-                             .get("date", ""))
-            if last_update and last_update >= date_cutoff:
-                filtered.append(s)
-        return filtered
+    if china_only:
+        params["filter.advanced"] = "AREA[LocationCountry]China"
+    else:
+        params.pop("filter.advanced", None)
+    try:
+        all_studies = _get_studies(params, headers)
+    except Exception as e:
+        print(f"Error fetching data from CTGov: {e}")
+        return []
+    return _mark_china([s for s in all_studies if _last_update(s) >= date_cutoff])
 
-    return all_studies
 
+def _mark_china(studies):
+    """抓取后一次遍历为每个 study 计算并附加 "_has_china",下游摘要/详情直接读取"""
+    for s in studies:
+        s["_has_china"] = _scan_china(s)
+    return studies
 
-def has_china_center(study):
-    """判断单个 study 是否含中国中心"""
-    locations = (study.get("protocolSection", {})
-                        .get("contactsLocationsModule", {})
-                        .get("locations", []))
+
+def _scan_china(study):
+    locations = dget(study, "protocolSection", "contactsLocationsModule", "locations", default=())
     return any(loc.get("country") == "China" for loc in locations)
 
 
+def dget(d, *keys, default="N/A"):
+    """
+    按 keys 逐层读取嵌套 dict 字段,任一层缺失/为 None/非 dict 时返回 default。
+    替代 d.get(a, {}).get(b, {}).get(c, x) 链式写法(不为缺省值分配中间空 dict)。
+    """
+    for k in keys:
+        if not isinstance(d, dict):
+            return default
+        d = d.get(k)
+        if d is None:
+            return default
+    return d
+
+
+def _last_update(study):
+    """提取 study 的最近更新日期(YYYY-MM-DD),缺失时返回空串"""
+    return dget(study, "protocolSection", "statusModule", "lastUpdatePostDateStruct", "date", default="")
+
+
+def has_china_center(study):
+    """判断单个 study 是否含中国中心(优先读取 fetch_studies 附加的 "_has_china")"""
+    flag = study.get("_has_china")
+    if flag is None:
+        flag = study["_has_china"] = _scan_china(study)
+    return flag
+
+
 def get_nct_id(study):
     """提取 study 的 NCT 编号"""
-    return (study.get("protocolSection", {})
-                 .get("identificationModule", {})
-                 .get("nctId", "N/A"))
+    return dget(study, "protocolSection", "identificationModule", "nctId")
@@ -0,0 +1,18 @@
+"""
+http_client - 进程级共享 HTTP Session
+
+所有渠道与抓取模块复用同一个 requests.Session,启用 keep-alive 与连接池,
+同一主机(ClinicalTrials.gov / Telegram / 飞书 / GeWe)的多次请求不再重复 TCP+TLS 握手。
+
+重试不在连接池层做(max_retries=0),统一交给 lib.retry.retry_with_backoff,
+避免两层重试叠加。requests.Session 对这类简单请求是线程安全的,可在线程池中共享。
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+SESSION = requests.Session()
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=Retry(total=0))
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
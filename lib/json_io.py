@@ -0,0 +1,72 @@
+"""
+json_io - JSON 文件读写(优先 orjson)
+
+试验 JSON 的落地与回写是 RAG 同步的热路径:orjson 为 C 实现,
+直接输出 UTF-8 字节,比标准库 json(尤其 indent=2)快数倍。
+未安装 orjson 时自动回退到标准库,输出格式保持一致(UTF-8、2 空格缩进)。
+
+只被脚本读取的大文件可用 dump_json_compact:紧凑格式,超过阈值时 gzip 压缩
+落地为 *.json.gz;load_json 按后缀自动识别。
+"""
+
+import gzip
+import json
+import os
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 为可选加速
+    orjson = None
+
+# 紧凑 JSON 超过该字节数时改写为 .json.gz
+GZIP_THRESHOLD = 256 * 1024
+
+
+def loads(raw):
+    """解析 JSON 字节串或字符串"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def dumps(data, indent=True):
+    """序列化为 UTF-8 字节串;indent=True 时 2 空格缩进"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(data, option=option)
+    if indent:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def load_json(path):
+    """读取 JSON 文件(.gz 后缀按 gzip 解压)"""
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rb") as f:
+        return loads(f.read())
+
+
+def dump_json(data, path, indent=True):
+    """写入 JSON 文件(UTF-8)"""
+    with open(path, "wb") as f:
+        f.write(dumps(data, indent=indent))
+
+
+def dump_json_compact(data, path, gzip_threshold=GZIP_THRESHOLD):
+    """
+    紧凑写入 JSON;序列化结果超过 gzip_threshold 字节时写为 <path>.gz 并删除未压缩文件。
+    返回实际写入的路径。
+    """
+    path = Path(path)
+    raw = dumps(data, indent=False)
+    if gzip_threshold is None or len(raw) <= gzip_threshold:
+        with open(path, "wb") as f:
+            f.write(raw)
+        return path
+    gz_path = path if path.suffix == ".gz" else path.with_name(path.name + ".gz")
+    with gzip.open(gz_path, "wb", compresslevel=3) as f:
+        f.write(raw)
+    if gz_path != path and path.exists():
+        os.remove(path)
+    return gz_path
@@ -6,26 +6,40 @@ llm_client - 多模型 fallback 翻译客户端
 - 统一 OpenAI 兼容协议(qwen/zhipu/gemini/openai 都走同一接口)
 - 多 API key 轮换(逗号分隔,key 失败时自动换下一个)
 - 向后兼容旧配置(LLM_PROVIDER + zhipu_*/gemini_*)
+- 按模型预占式限流(rpm/tpm,避免突发请求触发 429)
+- 翻译结果持久化缓存 + 并发去重(相同文本只请求一次)
 
 配置来源(优先级高→低):
 1. config.yaml 的 translate_models 列表(推荐)
 2. .env 的 LLM_PROVIDER + 对应 provider 的 base_url/api_key/model 变量(旧,向后兼容)
 """
 
+import json
 import os
+import threading
 import time
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Dict, Optional
 
+import openai
 import urllib3
 import yaml
 from dotenv import load_dotenv
 from openai import OpenAI
 
+from lib.rate_limiter import RateLimiter, estimate_tokens
+from lib.retry import retry_with_backoff
+from lib.translation_cache import translation_cache
+
 # 禁用 SSL 警告(与现有代码行为一致)
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 load_dotenv()
 
+# 全局默认限流(每分钟请求数 / token 数),0 表示不限;单个模型可在 config.yaml 用 rpm/tpm 覆盖
+_DEFAULT_RPM = int(os.getenv("LLM_RPM", "0"))
+_DEFAULT_TPM = int(os.getenv("LLM_TPM", "0"))
+
 # ============ 预置翻译 prompt(供调用方选用)============
 # 短字段翻译(标题、状态、适应症等),用于 daily 抓取后的简报
 PROMPT_SHORT_FIELD = "你是一个专业的医学翻译，请将以下临床试验相关文本翻译成准确、专业的中文。只返回翻译结果。"
@@ -38,6 +52,13 @@ PROMPT_FULL_MARKDOWN = (
     "3. 不要输出翻译结果以外的内容。"
 )
 
+# 批量字段翻译(JSON 进 JSON 出),一次请求翻译多个字段,摊薄单次请求开销
+PROMPT_JSON_BATCH = (
+    "你是一个专业的医学翻译助手。用户会给出一个 JSON 对象,值为临床试验相关的英文文本。"
+    "请返回一个 JSON 对象,键与输入完全相同,值为对应的专业中文翻译。"
+    "不要增删键,不要输出 JSON 以外的任何内容。"
+)
+
 
 # ============ 模型配置加载 ============
 def _load_translate_models() -> List[Dict]:
@@ -83,6 +104,8 @@ def _load_translate_models() -> List[Dict]:
                         "api_keys": keys,
                         "timeout": int(m.get("timeout", 60)),
                         "max_tokens": m.get("max_tokens"),
+                        "rpm": int(m.get("rpm") or _DEFAULT_RPM),
+                        "tpm": int(m.get("tpm") or _DEFAULT_TPM),
                     })
                 if models:
                     return models
@@ -120,6 +143,8 @@ def _load_translate_models() -> List[Dict]:
         "api_keys": keys,
         "timeout": 60,
         "max_tokens": None,
+        "rpm": _DEFAULT_RPM,
+        "tpm": _DEFAULT_TPM,
     }]
 
 
@@ -129,6 +154,13 @@ TRANSLATE_MODELS = _load_translate_models()
 # 每个模型当前使用的 key 索引(多 key 轮换)
 _model_key_index = {m["name"]: 0 for m in TRANSLATE_MODELS}
 
+# OpenAI 客户端缓存:同一 (base_url, key, timeout) 复用一个客户端及其连接池(keep-alive)
+_clients: Dict[tuple, OpenAI] = {}
+_clients_lock = threading.Lock()
+
+# 每个模型独立的限流器(线程安全,并发翻译时共享)
+_model_limiters = {m["name"]: RateLimiter(m.get("rpm"), m.get("tpm")) for m in TRANSLATE_MODELS}
+
 
 def _get_current_key(model_cfg: Dict) -> Optional[str]:
     """获取模型当前使用的 API key"""
@@ -139,6 +171,17 @@ def _get_current_key(model_cfg: Dict) -> Optional[str]:
     return keys[idx]
 
 
+def _get_client(base_url: str, api_key: str, timeout: int) -> OpenAI:
+    """按 (base_url, key, timeout) 复用 OpenAI 客户端,避免每次请求重新握手"""
+    key = (base_url, api_key, timeout)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+            _clients[key] = client
+    return client
+
+
 def _rotate_key(model_cfg: Dict):
     """切换到下一个 API key(多 key 轮换)"""
     name = model_cfg["name"]
@@ -147,10 +190,12 @@ def _rotate_key(model_cfg: Dict):
         _model_key_index[name] = (_model_key_index.get(name, 0) + 1) % len(keys)
 
 
-def _call_model(model_cfg: Dict, text: str, system_prompt: str, timeout: int) -> Optional[str]:
+def _call_model(model_cfg: Dict, text: str, system_prompt: str, timeout: int,
+                response_format: Optional[Dict] = None) -> Optional[str]:
     """
     用单个模型配置调用 OpenAI 兼容 API。
     成功返回翻译结果,失败返回 None(触发 fallback)。
+    response_format 透传给 API(如 {"type": "json_object"} 要求返回 JSON)。
     """
     api_key = _get_current_key(model_cfg)
     if not api_key:
@@ -166,15 +211,11 @@ def _call_model(model_cfg: Dict, text: str, system_prompt: str, timeout: int) ->
     }
     if model_cfg.get("max_tokens"):
         kwargs["max_tokens"] = model_cfg["max_tokens"]
+    if response_format:
+        kwargs["response_format"] = response_format
 
     try:
-        client = OpenAI(
-            api_key=api_key,
-            base_url=model_cfg["base_url"],
-            timeout=timeout,
-        )
-        response = client.chat.completions.create(**kwargs)
-        result = response.choices[0].message.content.strip()
+        result = _create(model_cfg, api_key, kwargs, timeout)
         if not result:
             return None
         return result
@@ -184,10 +225,7 @@ def _call_model(model_cfg: Dict, text: str, system_prompt: str, timeout: int) ->
         if len(model_cfg["api_keys"]) > 1:
             _rotate_key(model_cfg)
             try:
-                new_key = _get_current_key(model_cfg)
-                client = OpenAI(api_key=new_key, base_url=model_cfg["base_url"], timeout=timeout)
-                response = client.chat.completions.create(**kwargs)
-                result = response.choices[0].message.content.strip()
+                result = _create(model_cfg, _get_current_key(model_cfg), kwargs, timeout)
                 if result:
                     return result
             except Exception as e2:
@@ -195,6 +233,29 @@ def _call_model(model_cfg: Dict, text: str, system_prompt: str, timeout: int) ->
         return None
 
 
+@retry_with_backoff(max_tries=3, base=1.0, cap=30.0, retry_exceptions=(openai.APIConnectionError,))
+def _create(model_cfg: Dict, api_key: str, kwargs: Dict, timeout: int) -> str:
+    """
+    发起一次 chat.completions 请求:先向该模型的限流器预占额度,
+    返回后用 usage.total_tokens 校正。
+    429/5xx/连接错误在本模型内指数退避重试(最多 3 次,SDK 自带重试关闭避免叠加),
+    仍失败则抛给调用方触发换 key / fallback。
+    """
+    limiter = _model_limiters.get(model_cfg["name"])
+    est = estimate_tokens("".join(m["content"] for m in kwargs["messages"]))
+    reserved = limiter.acquire(est) if limiter else 0
+    actual = None
+    try:
+        client = _get_client(model_cfg["base_url"], api_key, timeout)
+        response = client.chat.completions.create(**kwargs)
+        usage = getattr(response, "usage", None)
+        actual = getattr(usage, "total_tokens", None) if usage else None
+        return (response.choices[0].message.content or "").strip()
+    finally:
+        if limiter:
+            limiter.reconcile(reserved, actual)
+
+
 # ============ 公共 API ============
 def translate_text(
     text: str,
@@ -224,7 +285,15 @@ def translate_text(
         print("⚠️  无可用翻译模型,返回原文")
         return text
 
-    # 按 fallback 链依次尝试
+    # 命中缓存直接返回;并发请求同一文本时只调用一次 LLM。失败结果不缓存。
+    result = translation_cache.get_or_compute(
+        text, system_prompt, lambda: _translate_uncached(text, system_prompt, timeout)
+    )
+    return result if result is not None else text
+
+
+def _translate_uncached(text: str, system_prompt: str, timeout: int) -> Optional[str]:
+    """按 fallback 链依次尝试模型,全部失败返回 None"""
     for model_cfg in TRANSLATE_MODELS:
         result = _call_model(model_cfg, text, system_prompt, timeout)
         if result is not None:
@@ -233,7 +302,74 @@ def translate_text(
         time.sleep(0.5)
 
     print("⚠️  所有翻译模型都失败,返回原文")
-    return text
+    return None
+
+
+def translate_many(
+    texts: Iterable[str],
+    system_prompt: Optional[str] = None,
+    max_workers: int = 8,
+    timeout: int = 60,
+) -> Dict[str, str]:
+    """
+    并发翻译多条文本(线程池扇出,I/O 密集),返回 {原文: 译文} 映射。
+
+    参数:
+        texts:         待翻译文本(自动去重,空串跳过)
+        system_prompt: 系统提示词(默认 PROMPT_SHORT_FIELD)
+        max_workers:   最大并发请求数(默认 8)
+        timeout:       单次请求超时秒数(默认 60)
+
+    返回:
+        {原文: 译文} dict。单条失败时译文为原文(与 translate_text 一致)。
+    """
+    unique = [t for t in dict.fromkeys(texts) if t and t.strip()]
+    if not unique:
+        return {}
+    workers = max(1, min(max_workers, len(unique)))
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        results = ex.map(lambda t: translate_text(t, system_prompt=system_prompt, timeout=timeout), unique)
+        return dict(zip(unique, results))
+
+
+def translate_batch(items: Dict[str, str], timeout: int = 120) -> Optional[Dict[str, str]]:
+    """
+    批量翻译多个字段:一次请求发送 {key: 英文},要求模型返回 {key: 中文}。
+
+    参数:
+        items:   待翻译字段,键为任意字符串 id,值为原文
+        timeout: 单次请求超时秒数(默认 120,批量内容较长)
+
+    返回:
+        {key: 译文} dict(仅包含模型返回的字符串值)。
+        所有模型都失败或返回内容无法解析为 JSON 对象时返回 None,由调用方回退逐字段翻译。
+    """
+    if not items:
+        return {}
+    if not TRANSLATE_MODELS:
+        print("⚠️  无可用翻译模型,跳过批量翻译")
+        return None
+
+    payload = json.dumps(items, ensure_ascii=False)
+    for model_cfg in TRANSLATE_MODELS:
+        result = _call_model(model_cfg, payload, PROMPT_JSON_BATCH, timeout,
+                             response_format={"type": "json_object"})
+        if result is None:
+            print(f"⚠️  模型 {model_cfg['name']} 批量翻译失败,尝试下一个 fallback")
+            time.sleep(0.5)
+            continue
+        try:
+            parsed = json.loads(result)
+        except ValueError as e:
+            print(f"⚠️  模型 {model_cfg['name']} 批量翻译返回非 JSON: {e}")
+            return None
+        if not isinstance(parsed, dict):
+            print(f"⚠️  模型 {model_cfg['name']} 批量翻译返回的不是 JSON 对象")
+            return None
+        return {k: v for k, v in parsed.items() if isinstance(v, str) and v.strip()}
+
+    print("⚠️  所有翻译模型批量翻译都失败")
+    return None
 
 
 # ============ 向后兼容 API(供旧代码使用)============
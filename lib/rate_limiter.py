@@ -0,0 +1,84 @@
+"""
+rate_limiter - 请求数 + token 数双桶限流器
+
+在调用 LLM 前预占额度(请求数 RPM + token 数 TPM),额度不足时阻塞等待,
+避免突发请求触发服务端 429 后整批回退为原文。
+
+用法:
+    limiter = RateLimiter(rpm=60, tpm=100000)
+    reserved = limiter.acquire(estimate_tokens(text))   # 调用前预占
+    response = client.chat.completions.create(...)
+    limiter.reconcile(reserved, response.usage.total_tokens)  # 调用后按实际用量校正
+
+线程安全(threading.Condition),可在线程池中共享同一个实例。
+rpm / tpm 为 0 或 None 表示不限制对应维度。
+"""
+
+import threading
+import time
+
+
+def estimate_tokens(text, overhead=256):
+    """粗略估算一次请求的 token 数:中文为主的文本约 3 字符/token,另加输出余量"""
+    return len(text or "") // 3 + overhead
+
+
+class RateLimiter:
+    """令牌桶限流:两个按分钟匀速回填的桶(请求数 / token 数)"""
+
+    def __init__(self, rpm=None, tpm=None):
+        self.rpm = rpm or 0
+        self.tpm = tpm or 0
+        self.request_tokens = float(self.rpm)
+        self.llm_tokens = float(self.tpm)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        """按流逝时间回填两个桶(调用方需持有锁)"""
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self.request_tokens = min(self.rpm, self.request_tokens + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            self.llm_tokens = min(self.tpm, self.llm_tokens + elapsed * self.tpm / 60.0)
+
+    def _wait_time(self, tokens):
+        """计算两个桶都满足所需的等待秒数(调用方需持有锁)"""
+        wait = 0.0
+        if self.rpm and self.request_tokens < 1:
+            wait = max(wait, (1 - self.request_tokens) * 60.0 / self.rpm)
+        if self.tpm and self.llm_tokens < tokens:
+            wait = max(wait, (tokens - self.llm_tokens) * 60.0 / self.tpm)
+        return wait
+
+    def acquire(self, est_tokens=0):
+        """
+        阻塞直到两个桶都有余量,然后扣减。
+        返回实际预占的 token 数(超过 TPM 上限的估算会被截断为上限),供 reconcile 使用。
+        """
+        if not (self.rpm or self.tpm):
+            return 0
+        tokens = min(est_tokens, self.tpm) if self.tpm else 0
+        with self._cond:
+            while True:
+                self._refill()
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    break
+                self._cond.wait(timeout=wait)
+            if self.rpm:
+                self.request_tokens -= 1
+            if self.tpm:
+                self.llm_tokens -= tokens
+        return tokens
+
+    def reconcile(self, reserved, actual_tokens):
+        """用响应里的实际 token 用量校正预占值(多退少补,可暂时透支)"""
+        if not self.tpm or actual_tokens is None:
+            return
+        with self._cond:
+            self._refill()
+            self.llm_tokens = min(self.tpm, self.llm_tokens + reserved - actual_tokens)
+            self._cond.notify_all()
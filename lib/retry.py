@@ -0,0 +1,105 @@
+"""
+retry - 指数退避重试装饰器(带抖动,支持 Retry-After)
+
+用于 HTTP / LLM 调用:遇到 429 / 5xx 或连接类异常时按
+    delay = min(cap, base * 2**i) + random.uniform(0, 0.5)
+退避重试,避免固定间隔重试在限流时造成"惊群"放大。
+服务端返回 Retry-After(秒)时优先遵循(同样不超过 cap)。
+
+用法:
+    @retry_with_backoff(max_tries=5)
+    def _get(url):
+        resp = requests.get(url, timeout=30)
+        resp.raise_for_status()      # 让 4xx/5xx 以异常形式抛出,交给装饰器判断
+        return resp.json()
+
+协程函数使用 async_retry_with_backoff,参数与判断规则相同,等待时不阻塞事件循环:
+    @async_retry_with_backoff(max_tries=5, retry_exceptions=(openai.APIConnectionError,))
+    async def _chat(prompt):
+        return await client.chat.completions.create(...)
+
+判断规则:
+    - 异常带 HTTP 状态码(requests.HTTPError.response.status_code 或 openai 的 exc.status_code)
+      且在 retry_on 中 → 重试;其它状态码(如 400/401/404)直接抛出
+    - 异常类型属于 retry_exceptions(默认 requests 的连接错误/超时)→ 重试
+    - 重试次数用尽后抛出最后一次异常
+"""
+
+import asyncio
+import functools
+import random
+import time
+
+import requests
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+def _status_of(exc):
+    """从异常中提取 HTTP 状态码(兼容 requests 与 openai 异常)"""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+
+def _retry_after(exc):
+    """读取响应头的 Retry-After(秒),不存在或无法解析时返回 0"""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return max(0, int(headers.get("Retry-After", 0)))
+    except (TypeError, ValueError):
+        return 0
+
+
+def backoff_delay(attempt, base=1.0, cap=30.0):
+    """第 attempt 次(从 0 开始)重试前的等待秒数:指数退避 + 随机抖动"""
+    return min(cap, base * 2 ** attempt) + random.uniform(0, 0.5)
+
+
+def _retry_delay(e, attempt, max_tries, base, cap, retry_on, retry_exceptions, name):
+    """判断异常是否可重试:可重试时返回等待秒数(并打印提示),否则返回 None"""
+    status = _status_of(e)
+    retryable = (status in retry_on) if status is not None else isinstance(e, retry_exceptions)
+    if not retryable or attempt == max_tries - 1:
+        return None
+    delay = max(backoff_delay(attempt, base, cap), min(cap, _retry_after(e)))
+    print(f"⚠️  {name} 第{attempt + 1}次失败({status or type(e).__name__}),"
+          f"{delay:.1f}s 后重试")
+    return delay
+
+
+def retry_with_backoff(max_tries=5, base=1.0, cap=30.0, retry_on=RETRY_STATUS,
+                       retry_exceptions=(requests.ConnectionError, requests.Timeout)):
+    """指数退避重试装饰器,参数含义见模块说明"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(max_tries):
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    delay = _retry_delay(e, attempt, max_tries, base, cap, retry_on, retry_exceptions, func.__name__)
+                    if delay is None:
+                        raise
+                    time.sleep(delay)
+        return wrapper
+    return decorator
+
+
+def async_retry_with_backoff(max_tries=5, base=1.0, cap=30.0, retry_on=RETRY_STATUS,
+                             retry_exceptions=(requests.ConnectionError, requests.Timeout)):
+    """retry_with_backoff 的协程版本:用 asyncio.sleep 等待,重试期间其它任务照常运行"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            for attempt in range(max_tries):
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    delay = _retry_delay(e, attempt, max_tries, base, cap, retry_on, retry_exceptions, func.__name__)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+        return wrapper
+    return decorator
@@ -0,0 +1,75 @@
+"""
+study_cache - 结构化试验翻译结果缓存(按 NCT 编号 + 内容哈希,带过期时间)
+
+同一试验在 DAYS_BACK 窗口内每天都会被重新检索到,内容不变时无需再次调用 LLM。
+与 translation_cache(文本 → 译文,无过期)不同,这里存的是整条试验的结构化结果:
+- 单表 SQLite(标准库,无额外依赖),每个 NCT 编号只保留最新一份结果
+- content_hash 不一致(试验内容或模型变化)视为未命中,下次写入时覆盖旧结果
+- created_at 记录写入时间,由调用方按 max_age 判断是否过期
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+class StudyCache:
+    """SQLite 持久化的 {nct_id: (content_hash, value, created_at)} 缓存(线程安全)"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """惰性打开数据库(调用方需持有 _lock)。打开失败时降级为不缓存。"""
+        if self._conn is None and self.db_path:
+            try:
+                Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS study_results ("
+                    "nct_id TEXT PRIMARY KEY, content_hash TEXT NOT NULL, "
+                    "value TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️  试验缓存库打开失败,不使用缓存: {e}")
+                self.db_path = ""
+                self._conn = None
+        return self._conn
+
+    def get(self, nct_id, content_hash):
+        """
+        读取缓存,返回 (value, created_at);未命中、内容哈希不一致或读取失败时返回 None
+        """
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute(
+                    "SELECT value, created_at FROM study_results WHERE nct_id = ? AND content_hash = ?",
+                    (nct_id, content_hash),
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"⚠️  试验缓存读取失败: {e}")
+                return None
+        return tuple(row) if row else None
+
+    def set(self, nct_id, content_hash, value):
+        """写入缓存(覆盖该 NCT 编号的旧结果,created_at 记为当前时间)"""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO study_results (nct_id, content_hash, value, created_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (nct_id, content_hash, value, time.time()),
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️  试验缓存写入失败: {e}")
@@ -5,8 +5,11 @@ study_data - 试验数据清洗与本地落地
 (原第 2 个参数 translated_info 完全未被使用)。
 
 包含:
-- clean_study_data: 递归删除 RAG 冗余字段(ancestors / conditionBrowseModule 等)
+- clean_study_data: 递归删除 RAG 冗余字段(ancestors / conditionBrowseModule 等),原地修改
+- prune_study_data: 同上,但返回剔除冗余字段后的新对象(一次遍历完成拷贝+清理)
 - save_study_json:  落地单个 study 到 output/{date}-{condition}/{nct_id}.json
+- mark_pending / read_pending / ack_pending: 待同步索引 output/.pending_index.txt(每行一个 JSON 路径),
+  save_study_json 写入后追加,ctgov_full_sync_rag.py 读取处理,成功后才从索引移除,免去逐个解析 JSON 查状态
 
 文件格式约定(被 ctgov_full_sync_rag.py 消费):
     {
@@ -17,19 +20,52 @@ study_data - 试验数据清洗与本地落地
     }
 """
 
-import copy
-import json
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
 from dotenv import load_dotenv
 
+from lib.json_io import dump_json
 from lib.text_utils import sanitize_filename
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows 无 fcntl,仅有进程内线程锁
+    fcntl = None
+
 load_dotenv()
 
-# 冗余字段黑名单(RAG 不需要)
-_REDUNDANT_KEYS = ["ancestors", "conditionBrowseModule", "interventionBrowseModule", "derivedSection"]
+# 冗余字段黑名单(RAG 不需要;_has_china 为 fetch_studies 附加的运行期标记)
+_REDUNDANT_KEYS = frozenset({"ancestors", "conditionBrowseModule", "interventionBrowseModule", "derivedSection",
+                             "_has_china"})
+
+# 待同步索引(sidecar):每行一个 pending JSON 路径
+PENDING_INDEX = os.path.join("output", ".pending_index.txt")
+_index_lock = threading.Lock()
+
+
+@contextmanager
+def _locked_index():
+    """索引读写锁:进程内线程锁 + 跨进程文件锁(fcntl.flock,不可用时仅线程锁)"""
+    with _index_lock:
+        os.makedirs(os.path.dirname(PENDING_INDEX), exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(PENDING_INDEX + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_index_lines():
+    """读取索引全部非空行(调用方需持有 _locked_index)"""
+    with open(PENDING_INDEX, "r", encoding="utf-8") as f:
+        return [line for line in f.read().splitlines() if line.strip()]
 
 
 def clean_study_data(data):
@@ -48,6 +84,18 @@ def clean_study_data(data):
             clean_study_data(item)
 
 
+def prune_study_data(node):
+    """
+    返回剔除冗余字段后的新对象,原对象不变。
+    一次遍历同时完成拷贝和清理,替代 copy.deepcopy + clean_study_data 两遍遍历。
+    """
+    if isinstance(node, dict):
+        return {k: prune_study_data(v) for k, v in node.items() if k not in _REDUNDANT_KEYS}
+    if isinstance(node, list):
+        return [prune_study_data(item) for item in node]
+    return node
+
+
 def save_study_json(study_raw, base_dir=None, extra_fields=None,
                     clean=True, condition=None):
     """
@@ -79,10 +127,8 @@ def save_study_json(study_raw, base_dir=None, extra_fields=None,
         base_dir = os.path.join("output", folder_name)
     os.makedirs(base_dir, exist_ok=True)
 
-    # 深拷贝后清理(避免修改原对象)
-    raw_to_save = copy.deepcopy(study_raw) if clean else study_raw
-    if clean:
-        clean_study_data(raw_to_save)
+    # 拷贝时顺带剔除冗余字段(不修改原对象)
+    raw_to_save = prune_study_data(study_raw) if clean else study_raw
 
     # 组装落地数据
     combined_data = {
@@ -95,9 +141,54 @@ def save_study_json(study_raw, base_dir=None, extra_fields=None,
 
     file_path = os.path.join(base_dir, f"{nct_id}.json")
     try:
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(combined_data, f, ensure_ascii=False, indent=2)
+        dump_json(combined_data, file_path)
+        mark_pending(file_path)
         return file_path
     except Exception as e:
         print(f"Error saving study JSON ({nct_id}): {e}")
         return None
+
+
+def mark_pending(*paths):
+    """把 pending JSON 路径追加到待同步索引(线程安全,失败仅告警)"""
+    if not paths:
+        return
+    try:
+        with _locked_index():
+            with open(PENDING_INDEX, "a", encoding="utf-8") as f:
+                f.writelines(f"{os.path.abspath(p)}\n" for p in paths)
+    except OSError as e:
+        print(f"⚠️  待同步索引写入失败: {e}")
+
+
+def read_pending():
+    """
+    读取待同步索引,返回去重后的路径列表(不修改索引;处理成功后调用 ack_pending 移除)。
+    索引文件不存在时返回 None(调用方应回退为目录扫描)。
+    """
+    with _locked_index():
+        if not os.path.exists(PENDING_INDEX):
+            return None
+        lines = _read_index_lines()
+    return list(dict.fromkeys(lines))
+
+
+def ack_pending(*paths):
+    """
+    从索引中移除已处理完成的路径。在锁内重新读取索引后原子改写:
+    未确认(失败/未处理)的条目和读取之后新追加的条目都会保留。
+    """
+    if not paths:
+        return
+    done = {os.path.abspath(p) for p in paths}
+    try:
+        with _locked_index():
+            if not os.path.exists(PENDING_INDEX):
+                return
+            remaining = [line for line in _read_index_lines() if os.path.abspath(line) not in done]
+            tmp_path = PENDING_INDEX + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(f"{line}\n" for line in remaining)
+            os.replace(tmp_path, PENDING_INDEX)
+    except OSError as e:
+        print(f"⚠️  待同步索引更新失败: {e}")
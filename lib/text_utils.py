@@ -11,11 +11,24 @@ text_utils - 文本处理工具
 
 import json
 import re
+import string
+
+
+# 文件名非法字符:字母数字/下划线/空格/./- 以外的字符
+_UNSAFE_FILENAME_RE = re.compile(r"[^\w .\-]")
+
+# 纯 ASCII 快速路径:预计算删除表,str.translate 单次 C 层遍历
+_SAFE_ASCII = frozenset(string.ascii_letters + string.digits + "_ .-")
+_UNSAFE_ASCII_TABLE = {c: None for c in range(128) if chr(c) not in _SAFE_ASCII}
 
 
 def sanitize_filename(filename):
-    """清洗文件名:仅保留字母数字、空格、._-"""
-    return "".join([c for c in filename if c.isalnum() or c in (' ', '.', '_', '-')]).strip().replace(' ', '_')
+    """清洗文件名:仅保留字母数字(含中日韩等 Unicode 文字)、空格、._-"""
+    if filename.isascii():
+        cleaned = filename.translate(_UNSAFE_ASCII_TABLE)
+    else:
+        cleaned = _UNSAFE_FILENAME_RE.sub("", filename)
+    return cleaned.strip().replace(' ', '_')
 
 
 def markdown_to_plain(text):
@@ -0,0 +1,153 @@
+"""
+translation_cache - 翻译结果缓存(持久化 + 并发去重)
+
+同一段文本(如 "Pancreatic Cancer" 等适应症、同一试验的标题)在一次运行内和多次运行间
+会被反复翻译,每次都是一次计费的 LLM 往返。本模块提供:
+- 进程内 LRU:热点短文本(如重复出现的 outcome measure)直接命中内存,不查库
+- 持久化精确匹配缓存:SQLite 单表(标准库,无额外依赖),键为 sha256(prompt|text)
+- single-flight 并发去重:多个线程同时请求同一文本时只发起一次调用,其余等待结果
+- 静态词表:常见状态/疾病名直接返回固定译文,不占用缓存和 LLM
+
+环境变量:
+    TRANSLATION_CACHE_DB  缓存库路径(默认 ./data/translation_cache.db;置空则仅保留进程内缓存与去重)
+    TRANSLATION_LRU_SIZE  进程内 LRU 条数(默认 4096;0 关闭)
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TRANSLATION_CACHE_DB = os.getenv("TRANSLATION_CACHE_DB", "./data/translation_cache.db").strip()
+TRANSLATION_LRU_SIZE = int(os.getenv("TRANSLATION_LRU_SIZE", "4096"))
+
+# 静态词表:固定译文,跳过缓存和 LLM
+STATIC_TRANSLATIONS = {
+    "RECRUITING": "招募中",
+    "NOT_YET_RECRUITING": "尚未招募",
+    "COMPLETED": "已完成",
+    "ACTIVE_NOT_RECRUITING": "活跃但不招募",
+    "Pancreatic Cancer": "胰腺癌",
+}
+
+
+def cache_key(text, system_prompt=""):
+    """缓存键:sha256(prompt|text),不同 prompt 的译文互不混用"""
+    return hashlib.sha256(f"{system_prompt}|{text}".encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """进程内 LRU + SQLite 持久化缓存 + 进程内 single-flight(线程安全)"""
+
+    def __init__(self, db_path=TRANSLATION_CACHE_DB, lru_size=TRANSLATION_LRU_SIZE):
+        self.db_path = db_path
+        self.lru_size = lru_size
+        self._lru = OrderedDict()
+        self._lru_lock = threading.Lock()
+        self._conn = None
+        self._db_lock = threading.Lock()
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    def _connect(self):
+        """惰性打开数据库(调用方需持有 _db_lock)。打开失败时降级为无持久化。"""
+        if self._conn is None and self.db_path:
+            try:
+                Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS translations (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️  翻译缓存库打开失败,仅使用进程内去重: {e}")
+                self.db_path = ""
+                self._conn = None
+        return self._conn
+
+    def _remember(self, key, value):
+        """放入进程内 LRU,超出容量时淘汰最久未用的条目(已在库中,淘汰无需回写)"""
+        if self.lru_size <= 0:
+            return
+        with self._lru_lock:
+            self._lru[key] = value
+            self._lru.move_to_end(key)
+            if len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def get(self, key):
+        """读取缓存(先内存 LRU 后 SQLite),未命中返回 None"""
+        with self._lru_lock:
+            value = self._lru.get(key)
+            if value is not None:
+                self._lru.move_to_end(key)
+                return value
+        with self._db_lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            row = conn.execute("SELECT value FROM translations WHERE key = ?", (key,)).fetchone()
+        if row:
+            self._remember(key, row[0])
+            return row[0]
+        return None
+
+    def set(self, key, value):
+        """写入缓存(覆盖已有值;内存 LRU 与 SQLite 同时写入)"""
+        self._remember(key, value)
+        with self._db_lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                conn.execute("INSERT OR REPLACE INTO translations (key, value) VALUES (?, ?)", (key, value))
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️  翻译缓存写入失败: {e}")
+
+    def get_or_compute(self, text, system_prompt, compute):
+        """
+        查缓存,未命中则调用 compute() 计算并写入。
+        同一键的并发调用只执行一次 compute,其余线程等待并共享结果。
+        compute 返回 None 表示失败:不写缓存,直接返回 None。
+        """
+        if text in STATIC_TRANSLATIONS:
+            return STATIC_TRANSLATIONS[text]
+
+        key = cache_key(text, system_prompt)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            return future.result()
+
+        try:
+            result = compute()
+            if result is not None:
+                self.set(key, result)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+
+# 模块级单例,供 llm_client 使用
+translation_cache = TranslationCache()
@@ -24,6 +24,7 @@
     python3 main.py
 """
 import argparse
+import importlib
 import os
 import subprocess
 import sys
@@ -51,7 +52,7 @@ def print_banner():
 
 # ============ 向后兼容:subprocess 调用(保留原有 run_step)============
 def run_step(script_name, description, args=None):
-    """通过 subprocess 调用脚本(向后兼容,供 auto_pipeline 和交互菜单使用)"""
+    """通过 subprocess 调用脚本(向后兼容,供推送已有报告菜单及 run_stage 导入失败时回退使用)"""
     print(f"\n{'='*60}")
     print(f"▶️  {description}")
     print(f"{'='*60}\n")
@@ -68,21 +69,62 @@ def run_step(script_name, description, args=None):
         return False
 
 
+# ============ 进程内执行流水线步骤(免去每步重新启动解释器和导入依赖)============
+def run_stage(module_name, description, func, script_args=None):
+    """
+    进程内导入模块并执行 func(module);导入失败时回退为 run_step 子进程执行。
+    返回是否成功,异常(含 SystemExit 非 0)视为失败,与子进程退出码语义一致。
+    """
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError as e:
+        print(f"⚠️  进程内导入 {module_name} 失败({e}),回退为子进程执行")
+        return run_step(f"{module_name}.py", description, script_args)
+
+    print(f"\n{'='*60}")
+    print(f"▶️  {description}")
+    print(f"{'='*60}\n")
+    try:
+        func(module)
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            print(f"\n❌ {description} - 失败 (退出码: {e.code})\n")
+            return False
+    except Exception as e:
+        print(f"\n❌ {description} - 异常: {e}\n")
+        return False
+    print(f"\n✅ {description} - 完成\n")
+    return True
+
+
+def stage_download(description="下载最新临床试验"):
+    return run_stage("daily_ctgov_check_tgbot", description, lambda m: m.main())
+
+
+def stage_rag(description="全文翻译生成 RAG"):
+    return run_stage("ctgov_full_sync_rag", description, lambda m: m.main())
+
+
+def stage_fastgpt(description=None):
+    description = description or f"同步到 FastGPT (模式: {UPLOAD_MODE})"
+    return run_stage("fastgpt_sync", description, lambda m: m.run_once(UPLOAD_MODE),
+                     ["--once", f"--mode={UPLOAD_MODE}"])
+
+
 def auto_pipeline():
     """自动执行完整流程:下载 → 翻译 → 上传(向后兼容 --auto)"""
     print_banner()
     print("📋 自动流程模式:执行完整订阅链路\n")
 
     steps = [
-        ("daily_ctgov_check_tgbot.py", "步骤 1/3: 从 ClinicalTrials.gov 下载最新试验数据"),
-        ("ctgov_full_sync_rag.py", "步骤 2/3: 全文翻译并生成 RAG 语料"),
-        ("fastgpt_sync.py", f"步骤 3/3: 同步到 FastGPT (模式: {UPLOAD_MODE})", ["--once", f"--mode={UPLOAD_MODE}"])
+        (stage_download, "步骤 1/3: 从 ClinicalTrials.gov 下载最新试验数据"),
+        (stage_rag, "步骤 2/3: 全文翻译并生成 RAG 语料"),
+        (stage_fastgpt, f"步骤 3/3: 同步到 FastGPT (模式: {UPLOAD_MODE})")
     ]
 
     success_count = 0
-    for script, desc, *extra_args in steps:
-        args = extra_args[0] if extra_args else None
-        if run_step(script, desc, args):
+    for stage, desc in steps:
+        if stage(desc):
             success_count += 1
         else:
             print(f"\n⚠️  流程中断于: {desc}")
@@ -314,9 +356,8 @@ def show_sync_status():
         return
 
     try:
-        import json
-        with open(state_file, 'r', encoding='utf-8') as f:
-            state = json.load(f)
+        from lib.json_io import load_json
+        state = load_json(state_file)
         files = state.get("files", {})
         print(f"✅ 已同步文件数: {len(files)}")
         recent = sorted(files.items(), key=lambda x: x[1].get('uploadTime', ''), reverse=True)[:5]
@@ -446,11 +487,11 @@ def manual_menu():
         choice = input("\n请选择操作 [0-7]: ").strip()
 
         if choice == "1":
-            run_step("daily_ctgov_check_tgbot.py", "下载最新临床试验")
+            stage_download()
         elif choice == "2":
-            run_step("ctgov_full_sync_rag.py", "全文翻译生成 RAG")
+            stage_rag()
         elif choice == "3":
-            run_step("fastgpt_sync.py", f"同步到 FastGPT (模式: {UPLOAD_MODE})", ["--once", f"--mode={UPLOAD_MODE}"])
+            stage_fastgpt()
         elif choice == "4":
             show_sync_status()
         elif choice == "5":
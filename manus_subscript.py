@@ -5,6 +5,8 @@ Daily Clinical Trials Update Script
 支持邮件、Telegram、微信和多个飞书机器人群推送，采用精美卡片格式
 """
 
+import asyncio
+import contextlib
 import requests
 import json
 import smtplib
@@ -13,10 +15,30 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.utils import formatdate
 import os
+import re
 import sys
 import time
+import weakref
+from functools import lru_cache
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import APIConnectionError, AsyncOpenAI
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp 为可选加速:未安装时在线程中经 SESSION 发送
+    aiohttp = None
+
+try:
+    import ijson
+except ImportError:  # ijson 为可选:未安装时整页读入后解析
+    ijson = None
+
+from lib.json_io import dump_json, dumps, loads
+from lib.retry import async_retry_with_backoff
+from lib.study_cache import StudyCache
+from lib.translation_cache import cache_key
 
 # 加载环境变量
 load_dotenv()
@@ -38,6 +60,10 @@ FEISHU_APP_SECRET = os.getenv("FEISHU_APP_SECRET")
 FEISHU_CHAT_IDS = [i for i in os.getenv("FEISHU_CHAT_IDS", "").split(",") if i]
 
 KEYWORDS = [i for i in os.getenv("KEYWORDS", "").split(",") if i]
+# 关键词预先转小写并合并为一个正则,过滤时一次 C 级扫描
+_KW_LC = [k.lower() for k in KEYWORDS]
+_KW_RE = re.compile('|'.join(map(re.escape, _KW_LC))) if _KW_LC else None
+_ISO_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
 DAYS_BACK = int(os.getenv("DAYS_BACK", 30))
 
 # LLM 配置
@@ -46,26 +72,78 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 ZHIPU_API_KEY = os.getenv("zhipu_api_key")
 ZHIPU_BASE_URL = os.getenv("zhipu_base_url", "https://open.bigmodel.cn/api/paas/v4")
 ZHIPU_MODEL_NAME = os.getenv("zhipu_model_name", "glm-4-air")
+# ClinicalTrials.gov 分页大小与最多翻页数
+PAGE_SIZE = 100
+MAX_PAGES = int(os.getenv("MAX_PAGES", 10))
+
+# 同时进行的 LLM 翻译请求数上限;每个请求合并翻译的研究数(摊薄单次请求的固定开销)
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", 8))
+LLM_BATCH_SIZE = 5
+
+# 同时在途的飞书 / Telegram 发送数上限
+SEND_CONCURRENCY = 16
+
+# 结构化翻译结果缓存:同一试验在 DAYS_BACK 窗口内每天都会出现,内容不变时直接复用上次结果(超过有效期重新翻译)
+STUDY_CACHE = StudyCache(os.path.join(OUTPUT_DIR, ".study_cache.db"))
+STUDY_CACHE_MAX_AGE = 30 * 86400
+
+# 全局 HTTP 会话:ClinicalTrials.gov / 飞书 / Telegram 请求复用 Keep-Alive 连接,免去每次重新握手
+# 始终校验证书;企业代理等自签 CA 环境请设置 REQUESTS_CA_BUNDLE 指向 CA 文件,不要关闭校验
+SESSION = requests.Session()
+SESSION.verify = True
+SESSION.headers.update({"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"})
+_adapter = HTTPAdapter(pool_connections=20, pool_maxsize=50,
+                       max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]))
+SESSION.mount("https://", _adapter)
+
+def _http_session():
+    """
+    推送用的 aiohttp 会话(所有飞书 / Telegram 发送共享,按主机复用连接);未安装 aiohttp 时为空上下文(None)
+    """
+    if aiohttp is None:
+        return contextlib.nullcontext()
+    return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=64, limit_per_host=32, ttl_dns_cache=300))
+
+async def _post_json(http, url, payload, headers=None):
+    """
+    POST JSON 并返回解析后的响应:有 aiohttp 会话时直接在事件循环中发送,否则在线程中经 SESSION 发送
+    """
+    if http is not None:
+        async with http.post(url, json=payload, headers=headers, timeout=aiohttp.ClientTimeout(total=10)) as r:
+            return await r.json(content_type=None)
+    return await asyncio.to_thread(lambda: SESSION.post(url, json=payload, headers=headers, timeout=10).json())
+
+# 初始化 LLM 客户端(异步客户端,多个研究的翻译可并发进行)
+# 重试统一由 _chat_completion 的 async_retry_with_backoff 负责,SDK 自带重试关闭(max_retries=0),避免叠加
 
-# 初始化 LLM 客户端
 def get_llm_client():
     if LLM_PROVIDER == "zhipu":
         if not ZHIPU_API_KEY:
             return None
-        return OpenAI(api_key=ZHIPU_API_KEY, base_url=ZHIPU_BASE_URL)
+        return AsyncOpenAI(api_key=ZHIPU_API_KEY, base_url=ZHIPU_BASE_URL, max_retries=0)
     else:
         if not OPENAI_API_KEY:
             return None
-        return OpenAI(api_key=OPENAI_API_KEY)
+        return AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0)
 
 client = get_llm_client()
 
+# 每个事件循环一个 LLM 并发信号量(每次 asyncio.run 都是新循环,信号量不能跨循环复用)
+_LLM_SEMS = weakref.WeakKeyDictionary()
+
+def _llm_semaphore():
+    loop = asyncio.get_running_loop()
+    sem = _LLM_SEMS.get(loop)
+    if sem is None:
+        sem = _LLM_SEMS[loop] = asyncio.Semaphore(LLM_CONCURRENCY)
+    return sem
+
 def get_llm_model():
     if LLM_PROVIDER == "zhipu":
         return ZHIPU_MODEL_NAME
     return "gpt-4o-mini"
 
-def get_feishu_access_token():
+async def get_feishu_access_token(http):
     """
     获取飞书 tenant_access_token
     """
@@ -75,8 +153,7 @@ def get_feishu_access_token():
         "app_secret": FEISHU_APP_SECRET
     }
     try:
-        response = requests.post(url, json=payload, timeout=10)
-        data = response.json()
+        data = await _post_json(http, url, payload)
         if data.get("code") == 0:
             return data.get("tenant_access_token")
         else:
@@ -86,7 +163,82 @@ def get_feishu_access_token():
         print(f"[{datetime.now()}] Feishu token exception: {e}")
         return None
 
-def get_study_details_with_llm(study_data):
+@async_retry_with_backoff(max_tries=5, base=1.0, cap=30.0, retry_exceptions=(APIConnectionError,))
+async def _chat_completion(prompt):
+    """
+    调用 LLM 并返回 JSON 文本:信号量限制在途请求数(退避等待期间不占名额),
+    429 / 5xx / 连接错误按指数退避 + 抖动重试
+    """
+    async with _llm_semaphore():
+        response = await client.chat.completions.create(
+            model=get_llm_model(),
+            messages=[
+                {"role": "system", "content": "你是一个专业的医学翻译助手。"},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            response_format={ "type": "json_object" }
+        )
+    return response.choices[0].message.content
+
+# LLM 返回的单个研究的结构化格式(单条与批量翻译共用)
+_RESULT_FORMAT = """{
+        "title_cn": "中文翻译标题",
+        "title_en": "英文原标题",
+        "nct_id": "NCT编号",
+        "status": "招募中 (RECRUITING)",
+        "phase": "试验阶段",
+        "conditions": "中文翻译适应症",
+        "sponsor": "申办方/发起人名称",
+        "contact_name": "主要研究者/联系人姓名",
+        "contact_role": "职称",
+        "contact_facility": "单位名称",
+        "contact_phone": "电话",
+        "contact_email": "邮箱"
+    }"""
+
+def _compact(value):
+    """
+    递归去掉空值与"未提供"占位(缺失字段由 LLM 按格式要求补"未提供")
+    """
+    if isinstance(value, dict):
+        return {k: c for k, v in value.items() if (c := _compact(v)) and c != '未提供'}
+    if isinstance(value, list):
+        return [c for v in value if (c := _compact(v)) and c != '未提供']
+    return value
+
+def _prompt_json(data):
+    """
+    写入 prompt 的原始数据:去掉占位字段并紧凑序列化(无缩进),减少输入 token
+    """
+    return dumps(_compact(data), indent=False).decode()
+
+def _study_content_hash(study_data):
+    """
+    内容哈希 = sha256(模型|原始数据),原始数据或模型变化时自动重新翻译
+    """
+    return cache_key(json.dumps(study_data, sort_keys=True, ensure_ascii=False), get_llm_model())
+
+def _cached_result(study_data):
+    """
+    读取缓存的结构化翻译结果,未命中或超过 STUDY_CACHE_MAX_AGE 时返回 None
+    """
+    cached = STUDY_CACHE.get(study_data['nct_id'], _study_content_hash(study_data))
+    if cached is None:
+        return None
+    value, created_at = cached
+    if time.time() - created_at > STUDY_CACHE_MAX_AGE:
+        return None
+    print(f"[{datetime.now()}] [{LLM_PROVIDER.upper()}] 缓存命中: {study_data['nct_id']}")
+    return loads(value)
+
+def _cache_result(study_data, result):
+    """
+    写入结构化翻译结果缓存
+    """
+    STUDY_CACHE.set(study_data['nct_id'], _study_content_hash(study_data), dumps(result, indent=False).decode())
+
+async def get_study_details_with_llm_async(study_data):
     """
     使用LLM提取并翻译研究详情，返回结构化数据
     """
@@ -111,57 +263,113 @@ def get_study_details_with_llm(study_data):
     请将以下临床试验的原始数据翻译并提取为结构化的中文信息。
     
     原始数据:
-    {json.dumps(study_data, indent=2, ensure_ascii=False)}
+    {_prompt_json(study_data)}
     
-    请严格按照以下JSON格式返回（不要有任何其他文字）：
-    {{
-        "title_cn": "中文翻译标题",
-        "title_en": "英文原标题",
-        "nct_id": "NCT编号",
-        "status": "招募中 (RECRUITING)",
-        "phase": "试验阶段",
-        "conditions": "中文翻译适应症",
-        "sponsor": "申办方/发起人名称",
-        "contact_name": "主要研究者/联系人姓名",
-        "contact_role": "职称",
-        "contact_facility": "单位名称",
-        "contact_phone": "电话",
-        "contact_email": "邮箱"
-    }}
+    原始数据中缺失的字段请填写"未提供"。请严格按照以下JSON格式返回（不要有任何其他文字）：
+    {_RESULT_FORMAT}
     """
     
     try:
+        cached = _cached_result(study_data)
+        if cached is not None:
+            return cached
+
         model = get_llm_model()
         print(f"[{datetime.now()}] [{LLM_PROVIDER.upper()}] Translating study {study_data['nct_id']} using model {model}...")
         
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "你是一个专业的医学翻译助手。"},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            response_format={ "type": "json_object" }
-        )
-        result = json.loads(response.choices[0].message.content)
+        result = loads(await _chat_completion(prompt))
+        _cache_result(study_data, result)
         print(f"[{datetime.now()}] [{LLM_PROVIDER.upper()}] 翻译 ok: {study_data['nct_id']}")
         return result
     except Exception as e:
         print(f"[{datetime.now()}] [{LLM_PROVIDER.upper()}] 翻译报错: {study_data['nct_id']} - Error: {e}")
         return None
 
-def save_to_local(study_raw, structured_data, search_query):
+async def translate_batch(raws):
+    """
+    一次 LLM 请求翻译多个研究,返回与 raws 等长、顺序一致的结果列表。
+    已缓存的研究不进入请求;返回条数或 NCT 编号对不上、解析失败时回退为逐条翻译。
+    """
+    if not client:
+        return [await get_study_details_with_llm_async(r) for r in raws]
+
+    try:
+        results = [_cached_result(r) for r in raws]
+    except Exception as e:
+        # 缓存库损坏/被锁等读取失败按未命中处理,不让异常打断整页翻译
+        print(f"[{datetime.now()}] [{LLM_PROVIDER.upper()}] 读取翻译缓存失败,全部重新翻译: {e}")
+        results = [None] * len(raws)
+    todo = [i for i, r in enumerate(results) if r is None]
+    if len(todo) <= 1:
+        for i in todo:
+            results[i] = await get_study_details_with_llm_async(raws[i])
+        return results
+
+    batch = [raws[i] for i in todo]
+    nct_ids = [r['nct_id'] for r in batch]
+    prompt = f"""
+    请将以下 {len(batch)} 个临床试验的原始数据逐一翻译并提取为结构化的中文信息。
+    
+    原始数据(items 数组):
+    {_prompt_json({"items": batch})}
+    
+    原始数据中缺失的字段请填写"未提供"。请严格按照以下JSON格式返回（不要有任何其他文字）：
+    {{"results": [...]}}
+    results 为长度 {len(batch)} 的数组，第 i 个元素对应 items 的第 i 项，每个元素的格式为：
+    {_RESULT_FORMAT}
+    """
+
+    try:
+        model = get_llm_model()
+        print(f"[{datetime.now()}] [{LLM_PROVIDER.upper()}] Translating batch {nct_ids} using model {model}...")
+        items = loads(await _chat_completion(prompt)).get("results")
+        if (not isinstance(items, list) or len(items) != len(batch)
+                or [isinstance(it, dict) and it.get("nct_id") for it in items] != nct_ids):
+            raise ValueError(f"返回 {len(items) if isinstance(items, list) else type(items).__name__} 条,与输入不匹配")
+    except Exception as e:
+        print(f"[{datetime.now()}] [{LLM_PROVIDER.upper()}] 批量翻译失败,改为逐条翻译: {nct_ids} - Error: {e}")
+        items = await asyncio.gather(*[get_study_details_with_llm_async(r) for r in batch])
+        for i, item in zip(todo, items):
+            results[i] = item
+        return results
+
+    for i, study_raw, item in zip(todo, batch, items):
+        _cache_result(study_raw, item)
+        results[i] = item
+    print(f"[{datetime.now()}] [{LLM_PROVIDER.upper()}] 批量翻译 ok: {nct_ids}")
+    return results
+
+async def _translate_stream(raws):
     """
-    将原文和翻译保存到本地 output 目录
+    按 LLM_BATCH_SIZE 分批并发翻译(在途请求数由 _chat_completion 的信号量限制),
+    每批一完成就逐条产出 (study_raw, structured_data),产出顺序为完成顺序
+    """
+    async def one(batch):
+        return batch, await translate_batch(batch)
+
+    batches = [raws[i:i + LLM_BATCH_SIZE] for i in range(0, len(raws), LLM_BATCH_SIZE)]
+    for fut in asyncio.as_completed([one(b) for b in batches]):
+        batch, structured = await fut
+        for pair in zip(batch, structured):
+            yield pair
+
+def _target_dir(search_query):
+    """
+    本次检索的输出目录: output/<日期>-<关键词>
+    """
+    date_str = datetime.now().strftime('%Y-%m-%d')
+    folder_name = f"{date_str}-{search_query.replace(' ', '_')}"
+    return os.path.join(OUTPUT_DIR, folder_name)
+
+def save_to_local(study_raw, structured_data, search_query, target_dir=None):
+    """
+    将原文和翻译保存到本地 output 目录(target_dir 由调用方预先创建时跳过建目录)
     """
     try:
         # 创建基础目录
-        date_str = datetime.now().strftime('%Y-%m-%d')
-        folder_name = f"{date_str}-{search_query.replace(' ', '_')}"
-        target_dir = os.path.join(OUTPUT_DIR, folder_name)
-
-        if not os.path.exists(target_dir):
-            os.makedirs(target_dir)
+        if target_dir is None:
+            target_dir = _target_dir(search_query)
+            os.makedirs(target_dir, exist_ok=True)
             
         # 组合数据
         combined_data = {
@@ -173,131 +381,213 @@ def save_to_local(study_raw, structured_data, search_query):
         # 文件路径
         file_path = os.path.join(target_dir, f"{study_raw['nct_id']}.json")
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(combined_data, f, ensure_ascii=False, indent=2)
+        dump_json(combined_data, file_path)
             
         print(f"[{datetime.now()}] Data saved to: {file_path}")
     except Exception as e:
         print(f"[{datetime.now()}] Error saving to local: {e}")
 
-def get_clinical_trials(search_query):
+async def save_to_local_async(study_raw, structured_data, search_query, target_dir=None):
     """
-    从ClinicalTrials.gov API获取指定关键词相关的临床试验并提取详细信息
+    在线程中执行 save_to_local,写盘与进行中的 LLM / HTTP 请求重叠
     """
-    try:
-        # 计算日期过滤
-        date_limit = (datetime.now() - timedelta(days=DAYS_BACK)).strftime('%Y-%m-%d')
-        
-        params = {
-            "query.cond": search_query,
-            "filter.overallStatus": "RECRUITING",
-            "pageSize": 5,
-            "format": "json"
+    await asyncio.to_thread(save_to_local, study_raw, structured_data, search_query, target_dir)
+
+def _extract_study_raw(study, date_limit):
+    """
+    按日期/状态/关键词过滤单个研究,通过则提取 LLM 所需的基础字段,否则返回 None
+    """
+    protocol = study.get('protocolSection', {})
+    id_info = protocol.get('identificationModule', {})
+    status_module = protocol.get('statusModule', {})
+
+    # 日期过滤
+    last_update_date_str = status_module.get('lastUpdatePostDateStruct', {}).get('date', '')
+    if last_update_date_str:
+        # API 返回的日期格式可能是 YYYY-MM-DD 或 YYYY-MM(按当月 1 日计);
+        # ISO 日期的字典序即时间序,直接与 date_limit 字符串比较,仅格式异常时才回退 strptime
+        if len(last_update_date_str) == 7: # YYYY-MM
+            last_update_date_str += '-01'
+        if _ISO_DATE_RE.fullmatch(last_update_date_str):
+            if last_update_date_str < date_limit:
+                return None
+        else:
+            try:
+                if datetime.strptime(last_update_date_str, '%Y-%m-%d') < datetime.strptime(date_limit, '%Y-%m-%d'):
+                    return None
+            except Exception:
+                pass
+
+    conditions_module = protocol.get('conditionsModule', {})
+    design_module = protocol.get('designModule', {})
+    contacts_locations = protocol.get('contactsLocationsModule', {})
+    sponsor_module = protocol.get('sponsorCollaboratorsModule', {})
+
+    nct_id = id_info.get('nctId', '')
+    title = id_info.get('officialTitle') or id_info.get('briefTitle', '')
+    status = status_module.get('overallStatus', '')
+
+    if status != 'RECRUITING':
+        return None
+
+    # 关键词过滤
+    conditions = conditions_module.get('conditions', [])
+    keywords_text = (title + ' ' + ' '.join(conditions)).lower()
+    if _KW_RE is None or not _KW_RE.search(keywords_text):
+        return None
+
+    # 提取基础信息
+    phases = design_module.get('phases', [])
+    phase_str = ', '.join(phases) if phases else "未提供"
+
+    # 提取申办方
+    sponsor = sponsor_module.get('leadSponsor', {}).get('name', '未提供')
+
+    # 提取联系人信息
+    central_contacts = contacts_locations.get('centralContacts', [])
+    contact_info = {}
+    if central_contacts:
+        contact = central_contacts[0]
+        contact_info = {
+            "name": contact.get('name', '未提供'),
+            "role": contact.get('role', '未提供'),
+            "phone": contact.get('phone', '未提供'),
+            "email": contact.get('email', '未提供')
         }
-        
-        print(f"[{datetime.now()}] Search query: {search_query}")
-        print(f"[{datetime.now()}] Params: {params}")
-        headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"}
-        # 禁用 SSL 验证警告并使用 verify=False 以避免某些环境下的证书问题
-        import urllib3
-        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-        
-        print(f"[{datetime.now()}] Sending request to ClinicalTrials.gov...")
-        try:
-            response = requests.get(API_URL, params=params, headers=headers, timeout=20, verify=False)
-            print(f"[{datetime.now()}] Response received, status: {response.status_code}")
-        except Exception as e:
-            print(f"[{datetime.now()}] Request failed: {e}")
-            return []
-        
-        data = response.json()
-        studies = data.get('studies', [])
-        print(f"[{datetime.now()}] Found {len(studies)} studies initially")
-        
-        results = []
+
+    # 提取第一个地点作为单位信息
+    locations = contacts_locations.get('locations', [])
+    facility = locations[0].get('facility', '未提供') if locations else "未提供"
+
+    study_raw = {
+        "nct_id": nct_id,
+        "title": title,
+        "status": status,
+        "phase": phase_str,
+        "conditions": conditions,
+        "sponsor": sponsor,
+        "contact": contact_info,
+        "facility": facility
+    }
+    return study_raw
+
+def _stream_studies(raw, meta):
+    """
+    用 ijson 增量解析响应体:逐个产出 studies 数组中的研究,不在内存中构建整页 JSON;
+    nextPageToken 解析到时写入 meta
+    """
+    builder = None
+    for prefix, event, value in ijson.parse(raw):
+        if builder is None and prefix == 'studies.item' and event == 'start_map':
+            builder = ijson.common.ObjectBuilder()
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == 'studies.item' and event == 'end_map':
+                yield builder.value
+                builder = None
+        elif prefix == 'nextPageToken' and event == 'string':
+            meta['nextPageToken'] = value
+
+def _fetch_page(search_query, date_limit, page_token=None):
+    """
+    拉取并过滤一页研究(按最近更新时间倒序),返回 (study_raw 列表, 本页条数, 本页最早更新日期, nextPageToken)。
+    已安装 ijson 时流式读取响应、边解析边过滤,只保留通过过滤的 study_raw;否则整页解析后过滤。
+    """
+    params = {
+        "query.cond": search_query,
+        "filter.overallStatus": "RECRUITING",
+        "sort": "LastUpdatePostDate:desc",
+        "pageSize": PAGE_SIZE,
+        "format": "json"
+    }
+    if page_token:
+        params["pageToken"] = page_token
+    print(f"[{datetime.now()}] Params: {params}")
+    meta = {}
+    raws = []
+    count = 0
+    last = None
+    with SESSION.get(API_URL, params=params, timeout=20, stream=ijson is not None) as response:
+        print(f"[{datetime.now()}] Response received, status: {response.status_code}")
+        # 4xx/5xx 或错误页不能当作"本页 0 条、无下一页"解析,否则翻页会悄悄结束
+        response.raise_for_status()
+        if ijson is not None:
+            # 让 urllib3 解压 gzip 传输,ijson 读到的是 JSON 文本
+            response.raw.decode_content = True
+            studies = _stream_studies(response.raw, meta)
+        else:
+            data = loads(response.content)
+            meta['nextPageToken'] = data.get('nextPageToken')
+            studies = data.get('studies', [])
         for study in studies:
-            protocol = study.get('protocolSection', {})
-            id_info = protocol.get('identificationModule', {})
-            status_module = protocol.get('statusModule', {})
-            
-            # 日期过滤
-            last_update_date_str = status_module.get('lastUpdatePostDateStruct', {}).get('date', '')
-            if last_update_date_str:
-                try:
-                    # API 返回的日期格式可能是 YYYY-MM-DD 或 YYYY-MM
-                    if len(last_update_date_str) == 7: # YYYY-MM
-                        last_update_date = datetime.strptime(last_update_date_str, '%Y-%m')
-                    else:
-                        last_update_date = datetime.strptime(last_update_date_str, '%Y-%m-%d')
-                    
-                    if last_update_date < datetime.strptime(date_limit, '%Y-%m-%d'):
-                        continue
-                except Exception:
-                    pass
-            
-            conditions_module = protocol.get('conditionsModule', {})
-            design_module = protocol.get('designModule', {})
-            contacts_locations = protocol.get('contactsLocationsModule', {})
-            sponsor_module = protocol.get('sponsorCollaboratorsModule', {})
-            
-            nct_id = id_info.get('nctId', '')
-            title = id_info.get('officialTitle') or id_info.get('briefTitle', '')
-            status = status_module.get('overallStatus', '')
-            
-            if status != 'RECRUITING':
-                continue
-            
-            # 关键词过滤
-            conditions = conditions_module.get('conditions', [])
-            keywords_text = (title + ' ' + ' '.join(conditions)).lower()
-            if not any(kw.lower() in keywords_text for kw in KEYWORDS):
-                continue
-            
-            # 提取基础信息
-            phases = design_module.get('phases', [])
-            phase_str = ', '.join(phases) if phases else "未提供"
-            
-            # 提取申办方
-            sponsor = sponsor_module.get('leadSponsor', {}).get('name', '未提供')
-            
-            # 提取联系人信息
-            central_contacts = contacts_locations.get('centralContacts', [])
-            contact_info = {}
-            if central_contacts:
-                contact = central_contacts[0]
-                contact_info = {
-                    "name": contact.get('name', '未提供'),
-                    "role": contact.get('role', '未提供'),
-                    "phone": contact.get('phone', '未提供'),
-                    "email": contact.get('email', '未提供')
-                }
-            
-            # 提取第一个地点作为单位信息
-            locations = contacts_locations.get('locations', [])
-            facility = locations[0].get('facility', '未提供') if locations else "未提供"
-            
-            study_raw = {
-                "nct_id": nct_id,
-                "title": title,
-                "status": status,
-                "phase": phase_str,
-                "conditions": conditions,
-                "sponsor": sponsor,
-                "contact": contact_info,
-                "facility": facility
-            }
-            
-            print(f"[{datetime.now()}] Processing details for {nct_id}...")
-            structured_data = get_study_details_with_llm(study_raw)
-            if structured_data:
-                save_to_local(study_raw, structured_data, search_query)
-                results.append(structured_data)
-            
-        return results
-        
+            count += 1
+            last = study
+            study_raw = _extract_study_raw(study, date_limit)
+            if study_raw:
+                raws.append(study_raw)
+    oldest = ''
+    if last is not None:
+        status_module = last.get('protocolSection', {}).get('statusModule', {})
+        oldest = status_module.get('lastUpdatePostDateStruct', {}).get('date', '')
+    return raws, count, oldest, meta.get('nextPageToken')
+
+async def _fetch_pages(search_query, date_limit, queue):
+    """
+    生产者:逐页拉取并过滤,每页的 study_raw 列表放入队列(结束或出错时放入 None,异常由消费者 await 时抛出)。
+    队列有界,翻译未跟上时暂停拉取;结果按更新时间倒序,一旦某页出现早于窗口的研究即停止翻页。
+    被取消(消费者已退出)时不放 None:此时无人取队列,队列满时 put 会永久阻塞。
+    """
+    try:
+        page_token = None
+        for page in range(MAX_PAGES):
+            raws, count, oldest, page_token = await asyncio.to_thread(_fetch_page, search_query, date_limit, page_token)
+            print(f"[{datetime.now()}] Page {page + 1}: {count} studies, {len(raws)} matched")
+            if raws:
+                await queue.put(raws)
+            if not page_token or (oldest and oldest < date_limit):
+                break
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        await queue.put(None)
+        raise
+    await queue.put(None)
+
+async def _collect_trials(search_query, on_result=None):
+    """
+    消费者:每取到一页即并发翻译并保存,同时生产者在后台预取下一页。
+    on_result(data) 为可选的协程函数,每条翻译完成即作为任务启动(如推送),不等整页/全部翻译结束
+    """
+    date_limit = (datetime.now() - timedelta(days=DAYS_BACK)).strftime('%Y-%m-%d')
+    queue = asyncio.Queue(maxsize=2)
+    target_dir = _target_dir(search_query)
+    os.makedirs(target_dir, exist_ok=True)
+    producer = asyncio.create_task(_fetch_pages(search_query, date_limit, queue))
+    results = []
+    pending = []
+    try:
+        while (raws := await queue.get()) is not None:
+            print(f"[{datetime.now()}] Processing details for {len(raws)} studies...")
+            async for study_raw, structured_data in _translate_stream(raws):
+                if structured_data:
+                    pending.append(asyncio.create_task(
+                        save_to_local_async(study_raw, structured_data, search_query, target_dir)))
+                    if on_result:
+                        pending.append(asyncio.create_task(on_result(structured_data)))
+                    results.append(structured_data)
+        # 取得生产者的抓取异常(如某页请求失败),按出错记录,不当作已抓全
+        await producer
     except Exception as e:
+        # 抓取/翻译中途出错:保留已翻译的结果,已启动的写盘与推送照常完成
         print(f"[{datetime.now()}] Error fetching trials: {e}")
-        return []
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+        # 单条写盘/推送失败只记录,不影响其它研究
+        for outcome in await asyncio.gather(*pending, return_exceptions=True):
+            if isinstance(outcome, Exception):
+                print(f"[{datetime.now()}] Save/broadcast task failed: {outcome!r}")
+    return results
 
 def build_feishu_card(data):
     """
@@ -375,24 +665,28 @@ def build_feishu_card(data):
         ]
     }
 
-def send_feishu_group_card(token, chat_id, data):
+def _feishu_card_content(data):
+    """
+    构建并序列化卡片(消息 content 字段);同一研究发往各群的卡片相同,调用方构建一次后复用
+    """
+    return dumps(build_feishu_card(data), indent=False).decode()
+
+async def send_feishu_group_card(http, token, chat_id, data, card_content=None):
     """
-    使用飞书机器人 API 向指定群组发送交互式卡片
+    使用飞书机器人 API 向指定群组发送交互式卡片(card_content 为预先序列化的卡片,缺省时现场构建)
     """
     url = "https://open.feishu.cn/open-apis/im/v1/messages?receive_id_type=chat_id"
-    card = build_feishu_card(data)
-    payload = {
-        "receive_id": chat_id,
-        "msg_type": "interactive",
-        "content": json.dumps(card)
-    }
     headers = {
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json; charset=utf-8"
     }
     try:
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
-        res_data = response.json()
+        payload = {
+            "receive_id": chat_id,
+            "msg_type": "interactive",
+            "content": card_content if card_content is not None else _feishu_card_content(data)
+        }
+        res_data = await _post_json(http, url, payload, headers)
         if res_data.get("code") == 0:
             print(f"[{datetime.now()}] Feishu card sent successfully to {chat_id}: {data['nct_id']}")
             return True
@@ -403,41 +697,106 @@ def send_feishu_group_card(token, chat_id, data):
         print(f"[{datetime.now()}] Feishu card exception for {chat_id}: {e}")
         return False
 
-def send_telegram_message(data):
+# Telegram 正文用到的字段(顺序即 _tg_text 的参数顺序)
+_TG_FIELDS = ("nct_id", "title_cn", "title_en", "status", "phase", "conditions", "sponsor",
+              "contact_name", "contact_role", "contact_facility", "contact_phone", "contact_email")
+
+@lru_cache(maxsize=512)
+def _tg_text(nct_id, title_cn, title_en, status, phase, conditions, sponsor,
+             contact_name, contact_role, contact_facility, contact_phone, contact_email):
     """
-    发送Telegram消息
+    按字段拼接 Telegram 消息正文(参数均为 str,可哈希,供 lru_cache 缓存)
     """
-    try:
-        content = f"""🔔 胰腺癌临床试验每日更新
+    return f"""🔔 胰腺癌临床试验每日更新
 
 临床基本信息
 
-标题: {data['title_cn']} ({data['title_en']})
-状态: {data['status']}
-研究编号: {data['nct_id']}
-试验阶段: {data['phase']}
-适应症: {data['conditions']}
-申办方/发起人: {data['sponsor']}
+标题: {title_cn} ({title_en})
+状态: {status}
+研究编号: {nct_id}
+试验阶段: {phase}
+适应症: {conditions}
+申办方/发起人: {sponsor}
 
 主要研究者/联系人:
-姓名: {data['contact_name']}
-职称: {data['contact_role']}
-单位: {data['contact_facility']}
-电话: {data['contact_phone']}
-邮箱: {data['contact_email']}
+姓名: {contact_name}
+职称: {contact_role}
+单位: {contact_facility}
+电话: {contact_phone}
+邮箱: {contact_email}
 
 详情链接:
-https://clinicaltrials.gov/study/{data['nct_id']}
+https://clinicaltrials.gov/study/{nct_id}
 """
+
+def _format_tg_text(data):
+    """
+    构建 Telegram 消息正文(纯函数,按字段值缓存;同一进程内重复发送/重试不再拼接字符串)
+    """
+    # 统一转为 str:LLM 偶尔返回列表等不可哈希的值,str() 与 f-string 的输出一致
+    return _tg_text(*(str(data[k]) for k in _TG_FIELDS))
+
+async def send_telegram_message(http, data):
+    """
+    发送Telegram消息(正文在 try 内构建:LLM 结果缺字段时只跳过这一条)
+    """
+    try:
+        content = _format_tg_text(data)
         telegram_url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
         payload = {
             "chat_id": TELEGRAM_CHAT_ID,
             "text": content
         }
-        requests.post(telegram_url, json=payload, timeout=10)
+        await _post_json(http, telegram_url, payload)
     except Exception as e:
         print(f"[{datetime.now()}] Telegram error: {e}")
 
+async def _broadcast(http, data, token_task, sem):
+    """
+    将一条研究并发推送到所有飞书群和 Telegram(共享同一 HTTP 会话;sem 限制在途发送数)
+    """
+    feishu_token = await token_task
+    sends = []
+    if feishu_token and FEISHU_CHAT_IDS:
+        try:
+            card_content = _feishu_card_content(data)
+        except Exception as e:
+            # LLM 结果缺字段等:只跳过这条研究的飞书卡片,Telegram 照常发送
+            print(f"[{datetime.now()}] Feishu card build error for {data.get('nct_id', '?')}: {e!r}")
+        else:
+            sends = [send_feishu_group_card(http, feishu_token, chat_id, data, card_content) for chat_id in FEISHU_CHAT_IDS]
+    sends.append(send_telegram_message(http, data))
+
+    async def one(send):
+        async with sem:
+            await send
+
+    await asyncio.gather(*[one(send) for send in sends])
+
+async def main_async(search_query):
+    """
+    在单个事件循环中完成全流程:分页抓取、LLM 翻译、写盘、飞书 token、飞书 / Telegram 推送均为并发任务。
+    每条研究翻译完成即推送;飞书 token 与试验抓取互不依赖,在后台预取,其往返被抓取耗时掩盖。
+    """
+    print(f"[{datetime.now()}] Starting clinical trials update for: {search_query}...")
+    print(f"[{datetime.now()}] Search query: {search_query}")
+
+    sem = asyncio.Semaphore(SEND_CONCURRENCY)
+    async with _http_session() as http:
+        token_task = asyncio.create_task(get_feishu_access_token(http))
+        try:
+            results = await _collect_trials(search_query, on_result=lambda data: _broadcast(http, data, token_task, sem))
+        except Exception as e:
+            print(f"[{datetime.now()}] Error fetching trials: {e}")
+            results = []
+        await token_task
+
+    if not results:
+        print(f"[{datetime.now()}] No new trials found.")
+        return
+        
+    print(f"[{datetime.now()}] Clinical trials update completed")
+
 def main():
     # 支持命令行参数输入或交互式输入
     if len(sys.argv) > 1:
@@ -449,25 +808,7 @@ def main():
         print("未输入关键词，程序退出。")
         return
 
-    print(f"[{datetime.now()}] Starting clinical trials update for: {search_query}...")
-    
-    feishu_token = get_feishu_access_token()
-    results = get_clinical_trials(search_query)
-    
-    if not results:
-        print(f"[{datetime.now()}] No new trials found.")
-        return
-
-    for data in results:
-        # 向所有配置的飞书群发送卡片
-        if feishu_token:
-            for chat_id in FEISHU_CHAT_IDS:
-                send_feishu_group_card(feishu_token, chat_id, data)
-        
-        # 发送 Telegram
-        send_telegram_message(data)
-        
-    print(f"[{datetime.now()}] Clinical trials update completed")
+    asyncio.run(main_async(search_query))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()